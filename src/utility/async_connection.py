@@ -0,0 +1,66 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncConnection(object):
+    """Base class for the asyncio variants of the api connections.
+    Runs the blocking calls of a wrapped connection object in a thread pool,
+    with at most `concurrency` calls in flight at the same time.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, connection, concurrency=10):
+        """Initializes the class
+
+        Args:
+            connection (object): the connection object whose methods are called
+            concurrency (Int, optional): Max amount of requests running at the same time. Defaults to 10.
+        """
+        self.connection = connection
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # created on first use, so it belongs to the running event loop
+        self._semaphore = None
+
+    async def _run(self, func, *args, **kwargs):
+        """Runs the blocking function in the thread pool once a slot is free
+
+        Args:
+            func (Callable): blocking function
+            *args, **kwargs: arguments for the function
+
+        Returns:
+            Any: the return value of the function
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def map(self, method, items, return_exceptions=False):
+        """Calls the method for every item concurrently
+
+        Args:
+            method (Callable): coroutine method of this class, e.g. self.update_user
+            items (Iterable): the items, each one is passed as the only argument to the method
+            return_exceptions (Bool, optional): If True exceptions are returned in the result instead of raised. Defaults to False.
+
+        Returns:
+            List[Any]: the results, in the same order as the items
+        """
+        return await asyncio.gather(*[method(x) for x in items], return_exceptions=return_exceptions)
+
+    def close(self):
+        """Waits for the running calls and shuts down the thread pool"""
+        self._executor.shutdown(wait=True)
+        if hasattr(self.connection, 'close'):
+            self.connection.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
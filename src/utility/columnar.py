@@ -0,0 +1,105 @@
+import decimal
+from typing import Any, Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# python types pyodbc reports for columns that can be stored in numpy arrays
+NUMERIC_TYPES = (int, float, bool, decimal.Decimal)
+
+
+def fetch_columns(cursor, arraysize: int = 10000):
+    """Fetches the result of an executed query into one array per column, chunk by chunk.
+    Numeric columns become numpy arrays when numpy is installed, integer columns with NULLs
+    become float arrays with nan. Other columns stay lists.
+
+    Args:
+        cursor (pyodbc.Cursor): cursor with an executed query
+        arraysize (int, optional): Amount of rows fetched from the database at a time. Defaults to 10000.
+
+    Returns:
+        Dict[str, Any]: arrays / lists mapped by column name, in the order of the columns
+    """
+    description = cursor.description
+    data = [[] for _ in description]
+    while True:
+        rows = cursor.fetchmany(arraysize)
+        if not rows:
+            break
+        for values, column in zip(data, zip(*rows)):
+            values.extend(column)
+    return { column[0]: _to_array(column[1], values) for column, values in zip(description, data) }
+
+
+def _to_array(type_code, data):
+    """Converts the values of a column to a numpy array if the column is numeric"""
+    if numpy is None or type_code not in NUMERIC_TYPES:
+        return data
+    has_null = any(x is None for x in data)
+    if type_code is bool and not has_null:
+        return numpy.array(data, dtype=bool)
+    if type_code is int and not has_null:
+        return numpy.array(data, dtype=numpy.int64)
+    return numpy.array([numpy.nan if x is None else float(x) for x in data], dtype=numpy.float64)
+
+
+def _numpy_keys(keys: Sequence[Any]):
+    """Turns the keys into a numpy array if numpy can group them the same way as a dict.
+    Returns None for keys numpy can't sort or would change, e.g. NULL (None) keys or a mix of types"""
+    if numpy is None:
+        return None
+    array = numpy.asarray(keys)
+    if array.dtype.kind in 'biuf':
+        return array
+    if array.dtype.kind == 'U' and (isinstance(keys, numpy.ndarray) or all(isinstance(x, str) for x in keys)):
+        return array
+    return None
+
+
+def group_sum(keys: Sequence[Any], values: Sequence[float]):
+    """Sums the values per key, e.g. finished courses per department
+
+    Args:
+        keys (Sequence[Any]): the group of each row
+        values (Sequence[float]): the value of each row
+
+    Returns:
+        Dict[Any, float]: the sum per key, rows with a NULL key are summed under None
+    """
+    array = _numpy_keys(keys)
+    if array is not None:
+        unique, inverse = numpy.unique(array, return_inverse=True)
+        sums = numpy.bincount(inverse, weights=numpy.asarray(values, dtype=numpy.float64), minlength=len(unique))
+        return dict(zip(unique.tolist(), sums.tolist()))
+    result = {}
+    for key, value in zip(keys, values):
+        result[key] = result.get(key, 0.0) + float(value)
+    return result
+
+
+def group_count(keys: Sequence[Any], mask: Sequence[bool] = None):
+    """Counts the rows per key, optionally only the rows where the mask is True,
+    e.g. assigned (no mask) and finished (mask of finished rows) per department
+
+    Args:
+        keys (Sequence[Any]): the group of each row
+        mask (Sequence[bool], optional): which rows to count. Defaults to None, all rows.
+
+    Returns:
+        Dict[Any, int]: the count per key, keys without any counted rows are 0. Rows with a NULL key are counted under None
+    """
+    array = _numpy_keys(keys)
+    if array is not None:
+        unique, inverse = numpy.unique(array, return_inverse=True)
+        weights = None if mask is None else numpy.asarray(mask, dtype=numpy.float64)
+        counts = numpy.bincount(inverse, weights=weights, minlength=len(unique))
+        return dict(zip(unique.tolist(), [int(x) for x in counts.tolist()]))
+    result = {}
+    if mask is None:
+        mask = [True] * len(keys)
+    for key, counted in zip(keys, mask):
+        result[key] = result.get(key, 0) + (1 if counted else 0)
+    return result
+
@@ -1,8 +1,16 @@
+import asyncio
 import requests
 import time
 from utility.name_changes import split_name
-from utility.eloomi_utility import get_department_by_name
+from utility.eloomi_utility import DepartmentIndex, get_department_by_name, get_user_update_data
+from utility.http_session import create_session, session_stats
+from utility.rate_limiter import RateLimiter
+from utility.token_manager import TokenManager, credential_key
+from utility.async_connection import AsyncConnection
+from utility.logger import PAYLOAD
+from utility.metrics import RequestMetrics
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 class EloomiConnection(object):
     """This class is used to connect to the eloomi api
@@ -10,44 +18,220 @@ class EloomiConnection(object):
     Args:
         object (object): Extends the Class Object 
     """
-    def __init__(self, logger, client_id, client_secret):
+    # query parameters used when walking the api page by page
+    page_param = 'page'
+    page_size_param = 'per_page'
+
+    def __init__(self, logger, client_id, client_secret, pool_size=10, timeout=(5, 60), max_retries=0,
+                 rate_limiter=None, cache=None, token_cache_path=None, metrics=None):
         """Initializes the class. creates the class varibales, including the access_token which it generates.
+
+        Args:
+            logger (Logger): logger used by the class
+            client_id (Str): id of the client
+            client_secret (Str): secret given by eloomi
+            pool_size (Int, optional): Max amount of keep-alive connections to the api. Defaults to 10.
+            timeout (Float / Tuple[Float, Float], optional): Default (connect, read) timeout in seconds. Defaults to (5, 60).
+            max_retries (Int, optional): Amount of retries on connection errors. Defaults to 0.
+            rate_limiter (RateLimiter, optional): Limiter pacing the requests, pass the same one to share the budget
+                                                  between threads or connection objects. Defaults to a new RateLimiter.
+            cache (SnapshotCache, optional): On-disk cache of users, departments and courses, keyed by the client_id. Defaults to None.
+            token_cache_path (Str, optional): Path to a json file the access token is cached in between runs. Defaults to None.
+            metrics (RequestMetrics, optional): Per-endpoint request metrics, pass the same one to combine connections. Defaults to a new RequestMetrics.
         
         CLASS VARIABLES
             endpoint:               String containing the value of the base url 
             client_id:              is the id of the client that's stored in the .env file and is used when calling the api
             client_secret:          is the secret given by eloomi. stored in the .env file and is used when generating the access_token
             access_token:           generated throught the api using client_id and client secret. 
+            token_manager:          caches the access_token per client and refreshes it before it expires
             headers:                basic header for api calls, contains the client_id and authorization token(BEARER TOKEN) 
             ratelimit_remaining:    is the remaining ratelimit that the eloomi has
+            session:                pooled keep-alive session, shared by every call made by this object
+            rate_limiter:           token bucket that paces every request made by this object
+            cache:                  optional snapshot cache, kept up to date by the writes made through this object
+            metrics:                per-endpoint latency, status, size, retry and rate limit metrics of every request
         """
         self.logger = logger
         self.endpoint = 'https://api.eloomi.com/'
         self.client_id = client_id
         self.client_secret = client_secret
-        self.access_token = self.create_access_token()
+        self.session = create_session(pool_size=pool_size, timeout=timeout, max_retries=max_retries)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_ratelimit_retries = 3
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else RequestMetrics('eloomi')
+        self.ratelimit_remaining = 600
+        self.token_manager = TokenManager(credential_key(self.endpoint, client_id, client_secret),
+                                          self._fetch_access_token, cache_path=token_cache_path)
+        self.access_token = self.token_manager.get_token()
         self.headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
             'Accept': 'application/json',
             'ClientId': self.client_id,
             'Authorization': self.access_token,
         }
-        self.ratelimit_remaining = 600
+
+    def connection_stats(self):
+        """Returns how many connections the session has opened and how often they were reused
+
+        Returns:
+            Dict: connections (Int), requests (Int), reused (Int) and reuse_ratio (Float)
+        """
+        return session_stats(self.session)
+
+    def close(self):
+        """Closes all the pooled connections"""
+        self.session.close()
     
     def set_ratelimit_remaining(self, headers):
         """
-        Takes in the heders from the response and checks if the rate limit is low, 
-        if the rate limit is low, the program halts for 30 seconds to allow the rate limit to reset
+        Takes in the heders from the response and passes them to the rate limiter,
+        which adjusts the pace of the next requests to the remaining rate limit
 
         Args:
             headers (Dict): headers recieved from eloomi api
         """
-        limit = int(headers._store['x-ratelimit-remaining'][1])
-        if(limit < 100):
-            self.logger.warning("Ratelimit is low, halting for 30 sec") 
-            time.sleep(30)
-        self.ratelimit_remaining = limit
+        limit = self.rate_limiter.update(headers)
+        if limit is not None:
+            self.ratelimit_remaining = limit
+
+    def _request(self, method, url, **kwargs):
+        """Prepares a request using the pooled session and sends it
+
+        Args:
+            method (Str): HTTP method
+            url (Str): url of the request
+            **kwargs: passed on to requests.Request, e.g. headers and data
+
+        Returns:
+            Response: the response from eloomi
+        """
+        return self._send(self.session.prepare_request(requests.Request(method, url, **kwargs)))
+
+    def _send(self, prep):
+        """Sends a prepared request, waiting on the rate limiter first and
+        updating it with the headers of the response. Requests that get a 429
+        are retried after the time the api asks for.
+
+        Args:
+            prep (PreparedRequest): prepared request
 
+        Returns:
+            Response: the response from eloomi
+        """
+        settings = self.session.merge_environment_settings(prep.url, {}, None, None, None)
+        authorized = 'Authorization' in prep.headers
+        refreshed = False
+        attempt = 0
+        seconds = 0.0
+        waited = 0.0
+        while True:
+            if authorized:
+                # use the current token, it may have been refreshed since the request was prepared
+                self._set_access_token(self.token_manager.get_token())
+                if self.access_token:
+                    prep.headers['Authorization'] = self.access_token
+            waited += self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.send(prep, **settings)
+            except requests.RequestException:
+                seconds += time.perf_counter() - start
+                self.metrics.record(prep.method, prep.url, 'error', seconds, retries=attempt + refreshed, ratelimit_wait=waited)
+                raise
+            seconds += time.perf_counter() - start
+            self.set_ratelimit_remaining(response.headers)
+            if response.status_code == 401 and authorized and not refreshed:
+                # only one refresh per request, and only one thread refreshes a rejected token
+                self.logger.warning("Access token was rejected, refreshing it")
+                self._set_access_token(self.token_manager.refresh(prep.headers['Authorization']))
+                refreshed = True
+                continue
+            if response.status_code != 429 or attempt == self.max_ratelimit_retries:
+                self.metrics.record(prep.method, prep.url, response.status_code, seconds, size=len(response.content),
+                                    retries=attempt + refreshed, ratelimit_wait=waited)
+                return response
+            attempt += 1
+            retry_after = response.headers.get('retry-after')
+            try:
+                retry_after = float(retry_after)
+            except (TypeError, ValueError):
+                retry_after = self.rate_limiter.window
+            self.logger.warning("Ratelimit reached, retrying in %s sec", retry_after)
+            self.rate_limiter.block(retry_after)
+
+    def invalidate_cache(self, endpoint=None):
+        """Removes the cached snapshots of this client, or only the one of the endpoint
+
+        Args:
+            endpoint (Str, optional): 'users', 'departments' or 'courses'. Defaults to None.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(self.client_id, endpoint)
+
+    def _cache_get(self, endpoint):
+        """Returns the cached snapshot of the endpoint, or None if there is no cache or no live snapshot"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self.client_id, endpoint)
+
+    def _cache_set(self, endpoint, data):
+        """Stores the snapshot of the endpoint, if caching is enabled"""
+        if self.cache is not None:
+            self.cache.set(self.client_id, endpoint, data)
+
+    def _cache_upsert(self, endpoint, record):
+        """Updates a record in the cached snapshot of the endpoint, if caching is enabled"""
+        if self.cache is not None:
+            self.cache.upsert_record(self.client_id, endpoint, record)
+
+    def _iter_pages(self, path, page_size):
+        """Walks a list endpoint page by page, yielding the records as each page arrives
+
+        Args:
+            path (Str): path of the endpoint, e.g. 'v3/users'
+            page_size (Int): amount of records fetched per request
+
+        Raises:
+            ValueError: if a page could not be fetched
+
+        Yields:
+            Dict: the records of the endpoint
+        """
+        url = self.endpoint + path
+        page = 1
+        previous_first = None
+        while True:
+            params = {self.page_param: page, self.page_size_param: page_size}
+            response = self._request('GET', url, headers=self.headers, params=params)
+
+            if response.status_code != 200:
+                self.logger.error("Getting page %s of %s failed with code %s", page, path, response.status_code)
+                self.logger.error(response)
+                raise ValueError("Getting page {} of {} failed with code {}".format(page, path, response.status_code))
+
+            response.encoding = 'utf-8'
+            body = response.json()
+            data = body['data']
+            # an api that ignores the page parameters returns the same page again
+            first = data[0].get('id') if data and isinstance(data[0], dict) else None
+            if page > 1 and first is not None and first == previous_first:
+                return
+            previous_first = first
+            for x in data:
+                yield x
+
+            # more records than asked for means the api returned the whole list at once
+            if len(data) < page_size or len(data) > page_size or not _has_next_page(body, page):
+                return
+            page += 1
+
+    def _set_access_token(self, token):
+        """Sets the token used by the requests of this object, if it is a valid token"""
+        if token and token != self.access_token:
+            self.access_token = token
+            self.headers['Authorization'] = token
 
     def create_access_token(self):
         """This method generates the API token (BEARER TOKEN)
@@ -55,6 +239,14 @@ class EloomiConnection(object):
         Returns:
             String: Bearer Token for the Eloomi API
         """
+        return self._fetch_access_token()[0]
+
+    def _fetch_access_token(self):
+        """Generates a new API token, used by the token manager
+
+        Returns:
+            String, Int: Bearer Token for the Eloomi API, or False if it failed, and the seconds until it expires
+        """
         url = self.endpoint + 'oauth/token'
 
         headers={
@@ -69,16 +261,17 @@ class EloomiConnection(object):
             'scope': '*',
         }
 
-        response = requests.post(url, headers=headers, data=data)
+        response = self._request('POST', url, headers=headers, data=data)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
             self.logger.info("Successfully created Access token")
-            return response.json()['access_token']
+            data = response.json()
+            return data['access_token'], data.get('expires_in')
         else:
-            self.logger.error('Creating access token did not work with status code {}'.format(response.status_code))
+            self.logger.error('Creating access token did not work with status code %s', response.status_code)
             self.logger.error(response)
-            return False
+            return False, None
 
     def get_users(self):
         """
@@ -89,22 +282,38 @@ class EloomiConnection(object):
         Returns:
             List[EloomiUser]: List of Eloomi Users 
         """
+        cached = self._cache_get('users')
+        if cached is not None:
+            return cached
+
         url = self.endpoint + 'v3/users'
 
-        response = requests.get(url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            # setting the rate limit
-            self.set_ratelimit_remaining(response.headers)
-            
             self.logger.info("Successfully fetched a list of all the users in eloomi")
-            return response.json()['data']
+            data = response.json()['data']
+            self._cache_set('users', data)
+            return data
         else:
-            self.logger.error('Getting eloomi user list failed with code {}'.format(response.status_code))
+            self.logger.error('Getting eloomi user list failed with code %s', response.status_code)
             self.logger.error(response)
             return False
     
+    def iter_users(self, page_size=100):
+        """
+        This method walks through all the users in eloomi page by page,
+        yielding each user as soon as its page has been fetched
+
+        Args:
+            page_size (Int, optional): Amount of users fetched per request. Defaults to 100.
+
+        Yields:
+            EloomiUser: Eloomi User
+        """
+        return self._iter_pages('v3/users', page_size)
+
     def update_user(self, user):
         """This method partially updates the user by it's employee_id (kennitala)
 
@@ -115,34 +324,24 @@ class EloomiConnection(object):
             EloomiUser: Updated User
         """
         url = self.endpoint + 'v3/users-employee_id/{}'.format(user['employee_id'].strip())
-        first_name, last_name = split_name(user['name'])
-        data = {
-            'first_name': first_name,
-            'last_name': last_name,
-            'username': user['username'].strip(),
-            'title': user['title'].strip(),
-            'email': user['email'].strip(),
-            'department_id': [str(user['department_id'])],
-            'direct_manager_ids': [user['manager_id']]
-        }
-        self.logger.info(user)
-        self.logger.info(data)
+        data = get_user_update_data(user)
+        self.logger.debug("User %s, payload %s", user, data, extra=PAYLOAD)
         # for some reason this request has to be manually made. 
-        sess = requests.Session()
-
         req = requests.Request('Patch', url, data=json.dumps(data), headers=self.headers)
-        prep = req.prepare()
+        prep = self.session.prepare_request(req)
         prep.headers['Content-Type'] = "application/json"
         prep.headers['Content-Length'] = len(json.dumps(data).encode('utf-8'))
         
-        response = sess.send(prep)
+        response = self._send(prep)
         
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            self.logger.info("Successfully Updated user: {}".format(user['email']))
-            return response.json()['data']
+            self.logger.info("Successfully Updated user: %s", user['email'])
+            data = response.json()['data']
+            self._cache_upsert('users', data)
+            return data
         else:
-            self.logger.error("Updating eloomi user failed with code {}: {}".format(response.status_code, response._content))
+            self.logger.error("Updating eloomi user failed with code %s: %s", response.status_code, response._content)
             self.logger.error(response)
             return False
 
@@ -160,14 +359,16 @@ class EloomiConnection(object):
         data = {
             'activate': 'deactivate'
         }
-        response = requests.patch(url, headers=self.headers, data=data)
+        response = self._request('PATCH', url, headers=self.headers, data=data)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            self.logger.info("Successfully Updated user: {}".format(email))
-            return response.json()['data']
+            self.logger.info("Successfully Updated user: %s", email)
+            data = response.json()['data']
+            self._cache_upsert('users', data)
+            return data
         else:
-            self.logger.error("Disabling eloomi user failed with code {}: {}".format(response.status_code, response._content))
+            self.logger.error("Disabling eloomi user failed with code %s: %s", response.status_code, response._content)
             self.logger.error(response)
             return False
             
@@ -186,14 +387,16 @@ class EloomiConnection(object):
             'activate': 'instant'
         }
 
-        response = requests.patch(url, headers=self.headers, data=data)
+        response = self._request('PATCH', url, headers=self.headers, data=data)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            self.logger.info("Successfully Updated user: {}".format(email))
-            return response.json()['data']
+            self.logger.info("Successfully Updated user: %s", email)
+            data = response.json()['data']
+            self._cache_upsert('users', data)
+            return data
         else:
-            self.logger.error("Enabling eloomi user failed with code {}: {}".format(response.status_code, response._content))
+            self.logger.error("Enabling eloomi user failed with code %s: %s", response.status_code, response._content)
             self.logger.error(response)
             return False
 
@@ -218,17 +421,18 @@ class EloomiConnection(object):
             'activate': 'instant',
             'user_permission': 'user'
         }
-        self.logger.info(user)
-        self.logger.info(data)
+        self.logger.debug("User %s, payload %s", user, data, extra=PAYLOAD)
 
-        response = requests.post(url, headers=self.headers, data=data)
+        response = self._request('POST', url, headers=self.headers, data=data)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            self.logger.info("Successfully created user {}".format(user['email']))
-            return response.json()['data']
+            self.logger.info("Successfully created user %s", user['email'])
+            data = response.json()['data']
+            self._cache_upsert('users', data)
+            return data
         else:
-            self.logger.error("{}".format(response._content))
+            self.logger.error("%s", response._content)
             self.logger.error(response)
             return False
 
@@ -240,28 +444,45 @@ class EloomiConnection(object):
         Returns:
             List[EloomiDepartment]: List of Eloomi Departments
         """
+        cached = self._cache_get('departments')
+        if cached is not None:
+            return cached
+
         url = self.endpoint + 'v3/units'
 
-        response = requests.get(url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            # setting the rate limit
-            self.set_ratelimit_remaining(response.headers)
-            
             self.logger.info("Successfully Fetched all departments from eloomi")
-            return response.json()['data']
+            data = response.json()['data']
+            self._cache_set('departments', data)
+            return data
         else:
-            self.logger.error("Getting eloomi department list failed with code {}".format(response.status_code))
+            self.logger.error("Getting eloomi department list failed with code %s", response.status_code)
             self.logger.error(response)
             return False
     
+    def iter_departments(self, page_size=100):
+        """
+        This method walks through all the departments in eloomi page by page,
+        yielding each department as soon as its page has been fetched
+
+        Args:
+            page_size (Int, optional): Amount of departments fetched per request. Defaults to 100.
+
+        Yields:
+            EloomiDepartment: Eloomi Department
+        """
+        return self._iter_pages('v3/units', page_size)
+
     def create_department(self, user, departments):
         """This method creates a department
 
         Args:
             user (EloomiUser): User with a department that does not exists and is being created
-            departments (List[EloomiDepartment]): List of currently created department, used to get the ID of the parent department
+            departments (List[EloomiDepartment] / DepartmentIndex): List of currently created department, used to get the ID of the parent department.
+                                                                    If it is a DepartmentIndex the new department is added to it
 
         Returns:
             Int: Returns the ID of the newly created eloomi department
@@ -273,19 +494,22 @@ class EloomiConnection(object):
             "parent_id": parent_id,
             "code": "{}-{}".format(user['mfld'].strip(), user['department'].strip())
         }
-        self.logger.info(user)
-        self.logger.info(data)
-        response = requests.post(url, headers=self.headers, data=data)
+        self.logger.debug("User %s, payload %s", user, data, extra=PAYLOAD)
+        response = self._request('POST', url, headers=self.headers, data=data)
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            self.logger.info("Successfully Created department: {}".format(user['department']))
-            return response.json()['data']['id']
+            self.logger.info("Successfully Created department: %s", user['department'])
+            created = dict(data, **response.json()['data'])
+            self._cache_upsert('departments', created)
+            if isinstance(departments, DepartmentIndex):
+                departments.add(created)
+            return created['id']
         else:
-            self.logger.warning('Creating eloomi department failed with code {}'.format(response.status_code))
+            self.logger.warning('Creating eloomi department failed with code %s', response.status_code)
             self.logger.error(response)
             return False
 
-    def update_department(self, department):
+    def update_department(self, department, departments=None):
         """This method updates a department, adding a leader takes 10 minutes to take effect
 
         Args:
@@ -297,7 +521,7 @@ class EloomiConnection(object):
                                name (Str): Name of the department
                                parent_id (Int): Eloomi ID of the parent department 
                                users (List[Int]): List of user IDs that are in this department
-
+            departments (DepartmentIndex, optional): Index that is updated if the request succeeds. Defaults to None.
 
         Returns:
             Dict / Bool: returns the updated department ( except leaders  ) if the request was successful, else it returns false
@@ -312,38 +536,51 @@ class EloomiConnection(object):
             "user_ids": department['users']
         }
         # for some reason this request has to be manually made. 
-        sess = requests.Session()
-
         req = requests.Request('Patch', url, data=json.dumps(data), headers=self.headers)
-        prep = req.prepare()
+        prep = self.session.prepare_request(req)
         prep.headers['Content-Type'] = "application/json"
         prep.headers['Content-Length'] = len(json.dumps(data).encode('utf-8'))
         
 
-        self.logger.info(data)
-        response = sess.send(prep)
+        self.logger.debug("Payload %s", data, extra=PAYLOAD)
+        response = self._send(prep)
         
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            # setting the rate limit
-            self.set_ratelimit_remaining(response.headers)
-            
             self.logger.info("Successfully Updated department in eloomi")
-            return response.json()['data']
+            data = response.json()['data']
+            self._cache_upsert('departments', data)
+            if departments is not None:
+                departments.update(dict(department, **data))
+            return data
         else:
-            self.logger.error("Updating eloomi department failed with code {}".format(response.status_code))
+            self.logger.error("Updating eloomi department failed with code %s", response.status_code)
             self.logger.error(response)
             return False
     
-    def delete_department(self, departmentid):
+    def delete_department(self, departmentid, departments=None):
         """This method deletes an department
 
         Args:
             departmentid (Int): ID of the department being deleted
+            departments (DepartmentIndex, optional): Index the department is removed from if the request succeeds. Defaults to None.
+
+        Returns:
+            Bool: True if the department was deleted
         """
         url = self.endpoint + 'v3/units/{}'.format(departmentid)
-        requests.delete(url, headers=self.headers)
+        response = self._request('DELETE', url, headers=self.headers)
+        if response.status_code in (200, 204):
+            if self.cache is not None:
+                self.cache.remove_record(self.client_id, 'departments', departmentid)
+            if departments is not None:
+                departments.remove(departmentid)
+            return True
+        else:
+            self.logger.error("Deleting eloomi department failed with code %s", response.status_code)
+            self.logger.error(response)
+            return False
 
     def get_courses(self):
         """
@@ -353,23 +590,39 @@ class EloomiConnection(object):
         Returns:
             List[EloomiCourses]: List of Eloomi Courses
         """
+        cached = self._cache_get('courses')
+        if cached is not None:
+            return cached
+
         url = self.endpoint + 'v3/courses'
 
-        response = requests.get(url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            # setting the rate limit
-            self.set_ratelimit_remaining(response.headers)
-            
             self.logger.info("Successfully Fetched all courses from eloomi")
             mapped_data = { "COURSE{}".format(str(x['id']).zfill(5)): x for x in response.json()['data'] }
+            self._cache_set('courses', mapped_data)
             return mapped_data
         else:
-            self.logger.error("Getting eloomi courses list failed with code {}".format(response.status_code))
+            self.logger.error("Getting eloomi courses list failed with code %s", response.status_code)
             self.logger.error(response)
             return False
         
+    def iter_courses(self, page_size=100):
+        """
+        This method walks through all the courses in eloomi page by page,
+        yielding each course as soon as its page has been fetched
+
+        Args:
+            page_size (Int, optional): Amount of courses fetched per request. Defaults to 100.
+
+        Yields:
+            Str, EloomiCourse: the course code, same as the keys from get_courses, and the course
+        """
+        for course in self._iter_pages('v3/courses', page_size):
+            yield "COURSE{}".format(str(course['id']).zfill(5)), course
+
     def get_participants(self, courseID):
         """
         This method fetches a list of all the participants for a specific course, using the ID
@@ -383,16 +636,164 @@ class EloomiConnection(object):
         """
         url = "{}v3/courses/{}/participants".format(self.endpoint, courseID)
 
-        response = requests.get(url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
 
         if response.status_code == 200:
             response.encoding = 'utf-8'
-            # setting the rate limit
-            self.set_ratelimit_remaining(response.headers)
-
-            self.logger.info("Successfully Fetched all participants for {} from eloomi".format(courseID))
+            self.logger.info("Successfully Fetched all participants for %s from eloomi", courseID)
             return response.json()['data']
         else:
-            self.logger.error("Getting eloomi participants list failed with code {}".format(response.status_code))
+            self.logger.error("Getting eloomi participants list failed with code %s", response.status_code)
             self.logger.error(response)
-            return False
\ No newline at end of file
+            return False
+
+
+    def get_all_participants(self, courses, max_workers=8):
+        """
+        This method fetches the participants of every course in parallel, using a bounded pool of workers.
+        The requests share the rate limiter, and a course that fails is recorded instead of stopping the rest.
+
+        Args:
+            courses (Dict[Str, EloomiCourse]): Courses mapped by code, as returned by get_courses
+            max_workers (Int, optional): Max amount of courses fetched at the same time. Defaults to 8.
+
+        Returns:
+            Dict[Str, List[EloomiUser]], Dict[Str, Str]: participants by course code, and the error for every course that failed
+        """
+        participants = {}
+        failures = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = { executor.submit(self.get_participants, course['id']): code for code, course in courses.items() }
+            for future in as_completed(futures):
+                code = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error("Getting participants for %s failed: %s", code, e)
+                    failures[code] = str(e)
+                    continue
+                if result is False:
+                    failures[code] = "Getting eloomi participants list failed"
+                else:
+                    participants[code] = result
+        self.logger.info("Fetched participants for %s courses, %s failed", len(participants), len(failures))
+        return participants, failures
+
+
+def _has_next_page(body, page):
+    """Checks the pagination info of a response, if it has any, to see if there is another page
+
+    Args:
+        body (Dict): the json body of the response
+        page (Int): the number of the current page
+
+    Returns:
+        Bool: False if the response says this is the last page. Without pagination info there may be another page,
+              _iter_pages then stops on a short, oversized or repeated page
+    """
+    meta = body.get('meta') or {}
+    if 'last_page' in meta:
+        return page < int(meta['last_page'])
+    links = body.get('links')
+    if isinstance(links, dict) and 'next' in links:
+        return bool(links['next'])
+    return True
+
+
+class AsyncEloomiConnection(AsyncConnection):
+    """Asyncio variant of EloomiConnection, with the same methods as coroutines.
+    The requests share one pooled session and rate limiter, and at most `concurrency` of them run at the same time.
+
+    Args:
+        AsyncConnection (AsyncConnection): Extends the AsyncConnection class
+    """
+    def __init__(self, logger, client_id, client_secret, concurrency=10, timeout=(5, 60), max_retries=0,
+                 rate_limiter=None, cache=None, token_cache_path=None, metrics=None):
+        """Initializes the class, creating the EloomiConnection the requests are made through
+
+        Args:
+            logger (Logger): logger used by the class
+            client_id (Str): id of the client
+            client_secret (Str): secret given by eloomi
+            concurrency (Int, optional): Max amount of requests running at the same time, also used as the pool size. Defaults to 10.
+            timeout (Float / Tuple[Float, Float], optional): Default (connect, read) timeout in seconds. Defaults to (5, 60).
+            max_retries (Int, optional): Amount of retries on connection errors. Defaults to 0.
+            rate_limiter (RateLimiter, optional): Limiter pacing the requests. Defaults to a new RateLimiter.
+            cache (SnapshotCache, optional): On-disk cache of users, departments and courses. Defaults to None.
+            token_cache_path (Str, optional): Path to a json file the access token is cached in between runs. Defaults to None.
+            metrics (RequestMetrics, optional): Per-endpoint request metrics. Defaults to a new RequestMetrics.
+        """
+        connection = EloomiConnection(logger, client_id, client_secret, pool_size=concurrency, timeout=timeout,
+                                      max_retries=max_retries, rate_limiter=rate_limiter, cache=cache,
+                                      token_cache_path=token_cache_path, metrics=metrics)
+        super(AsyncEloomiConnection, self).__init__(connection, concurrency=concurrency)
+        self.logger = logger
+        self.rate_limiter = connection.rate_limiter
+        self.metrics = connection.metrics
+
+    def connection_stats(self):
+        """Returns how many connections the session has opened and how often they were reused"""
+        return self.connection.connection_stats()
+
+    async def create_access_token(self):
+        """Async version of EloomiConnection.create_access_token"""
+        return await self._run(self.connection.create_access_token)
+
+    async def get_users(self):
+        """Async version of EloomiConnection.get_users"""
+        return await self._run(self.connection.get_users)
+
+    async def update_user(self, user):
+        """Async version of EloomiConnection.update_user"""
+        return await self._run(self.connection.update_user, user)
+
+    async def disable_user(self, email):
+        """Async version of EloomiConnection.disable_user"""
+        return await self._run(self.connection.disable_user, email)
+
+    async def enable_user(self, email):
+        """Async version of EloomiConnection.enable_user"""
+        return await self._run(self.connection.enable_user, email)
+
+    async def create_user(self, user):
+        """Async version of EloomiConnection.create_user"""
+        return await self._run(self.connection.create_user, user)
+
+    async def get_departments(self):
+        """Async version of EloomiConnection.get_departments"""
+        return await self._run(self.connection.get_departments)
+
+    async def create_department(self, user, departments):
+        """Async version of EloomiConnection.create_department"""
+        return await self._run(self.connection.create_department, user, departments)
+
+    async def update_department(self, department, departments=None):
+        """Async version of EloomiConnection.update_department"""
+        return await self._run(self.connection.update_department, department, departments)
+
+    async def delete_department(self, departmentid, departments=None):
+        """Async version of EloomiConnection.delete_department"""
+        return await self._run(self.connection.delete_department, departmentid, departments)
+
+    async def get_courses(self):
+        """Async version of EloomiConnection.get_courses"""
+        return await self._run(self.connection.get_courses)
+
+    async def get_participants(self, courseID):
+        """Async version of EloomiConnection.get_participants"""
+        return await self._run(self.connection.get_participants, courseID)
+
+    async def get_all_participants(self, courses):
+        """Async version of EloomiConnection.get_all_participants, limited by the concurrency of this class"""
+        codes = list(courses)
+        results = await asyncio.gather(*[self.get_participants(courses[x]['id']) for x in codes], return_exceptions=True)
+        participants = {}
+        failures = {}
+        for code, result in zip(codes, results):
+            if isinstance(result, Exception):
+                failures[code] = str(result)
+            elif result is False:
+                failures[code] = "Getting eloomi participants list failed"
+            else:
+                participants[code] = result
+        return participants, failures
@@ -0,0 +1,191 @@
+import hashlib
+import json
+from utility.eloomi_utility import get_department_id, get_user_update_data
+
+# fields that update_user sends, these are the ones compared between sql and eloomi
+SYNC_FIELDS = ['first_name', 'last_name', 'username', 'title', 'email', 'department_id', 'direct_manager_ids']
+
+
+class UserSyncPlan(object):
+    """The smallest set of writes needed to make eloomi match the sql source
+
+    Args:
+        object (object): Extends the Class Object
+
+    Instance Variables
+        creates:    List of sql users that don't exist in eloomi
+        updates:    List of sql users whose eloomi user has different data
+        enables:    List of emails of deactivated eloomi users that are in the sql source
+        disables:   List of emails of active eloomi users that are not in the sql source
+        unchanged:  Amount of users that need no write at all
+    """
+    def __init__(self):
+        self.creates = []
+        self.updates = []
+        self.enables = []
+        self.disables = []
+        self.unchanged = 0
+
+    def is_empty(self):
+        """Returns True if there is nothing to write"""
+        return not (self.creates or self.updates or self.enables or self.disables)
+
+    def summary(self):
+        """Returns the amount of each kind of write
+
+        Returns:
+            Dict[Str, Int]: creates, updates, enables, disables and unchanged
+        """
+        return {
+            'creates': len(self.creates),
+            'updates': len(self.updates),
+            'enables': len(self.enables),
+            'disables': len(self.disables),
+            'unchanged': self.unchanged,
+        }
+
+
+def _normalize_ids(ids):
+    """Turns a id or a list of ids into a sorted list of strings, without empty values"""
+    if ids is None:
+        return []
+    if not isinstance(ids, (list, tuple, set)):
+        ids = [ids]
+    return sorted(str(x).strip() for x in ids if x is not None and str(x).strip() != '')
+
+
+def normalize_user(data):
+    """Normalizes update data, either from get_user_update_data or a user from get_users,
+    so the two can be compared
+
+    Args:
+        data (Dict): user data with the SYNC_FIELDS
+
+    Returns:
+        Dict: normalized data
+    """
+    normalized = {}
+    for field in SYNC_FIELDS:
+        value = data.get(field)
+        if field in ('department_id', 'direct_manager_ids'):
+            normalized[field] = _normalize_ids(value)
+        else:
+            normalized[field] = '' if value is None else str(value).strip()
+    return normalized
+
+
+def user_fingerprint(data):
+    """Creates a fingerprint of the normalized user, equal fingerprints mean no update is needed
+
+    Args:
+        data (Dict): user data with the SYNC_FIELDS
+
+    Returns:
+        Str: sha1 hex digest
+    """
+    normalized = json.dumps(normalize_user(data), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def is_active(e_user):
+    """Default check for whether a eloomi user is active
+
+    Args:
+        e_user (EloomiUser): user from get_users
+
+    Returns:
+        Bool: False if the user has been deactivated
+    """
+    status = e_user.get('status', e_user.get('activate', 'active'))
+    return str(status).lower() not in ('deactivated', 'deactivate', 'inactive', 'disabled')
+
+
+def plan_user_sync(sql_users, e_users, e_departments=None, disable_missing=True, active_check=is_active):
+    """Compares the users from the sql source with the users in eloomi, and works out which
+    users have to be created, updated, enabled or disabled. Both sides are normalized with the same
+    rules update_user uses, and compared by fingerprint.
+
+    Args:
+        sql_users (List[Dict]): rows from SQLServerConnection.select, with employee_id, name, username, title, email
+                                and manager_id, and either department_id or mfld and department
+        e_users (List[EloomiUser]): users from EloomiConnection.get_users
+        e_departments (Dict, optional): eloomi departments mapped by code, used to find the department_id
+                                        of rows that don't have one, rows whose department isn't found get -1.
+                                        Required if any row has no department_id. Defaults to None.
+        disable_missing (Bool, optional): If True, active eloomi users that are not in the sql source are disabled. Defaults to True.
+        active_check (Callable, optional): Function that tells if a eloomi user is active. Defaults to is_active.
+
+    Raises:
+        ValueError: if a row has no department_id and e_departments was not given
+
+    Returns:
+        UserSyncPlan: the writes needed
+    """
+    plan = UserSyncPlan()
+    e_by_employee_id = {}
+    for e_user in e_users:
+        employee_id = str(e_user.get('employee_id') or '').strip()
+        if employee_id:
+            e_by_employee_id[employee_id] = e_user
+
+    seen = set()
+    for user in sql_users:
+        employee_id = user['employee_id'].strip()
+        if employee_id in seen:
+            continue
+        seen.add(employee_id)
+        if 'department_id' not in user:
+            if e_departments is None:
+                raise ValueError("User {} has no department_id, pass e_departments to look it up".format(employee_id))
+            user = dict(user, department_id=get_department_id(e_departments, user))
+
+        e_user = e_by_employee_id.get(employee_id)
+        if e_user is None:
+            plan.creates.append(user)
+            continue
+
+        written = False
+        if not active_check(e_user):
+            plan.enables.append(user['email'].strip())
+            written = True
+        if user_fingerprint(get_user_update_data(user)) != user_fingerprint(e_user):
+            plan.updates.append(user)
+            written = True
+        if not written:
+            plan.unchanged += 1
+
+    if disable_missing:
+        for employee_id, e_user in e_by_employee_id.items():
+            if employee_id not in seen and active_check(e_user):
+                plan.disables.append(e_user['email'])
+
+    return plan
+
+
+def apply_user_sync(connection, plan):
+    """Runs the writes of the plan through the connection. Created users are also
+    updated afterwards, since create_user doesn't set the department or manager.
+
+    Args:
+        connection (EloomiConnection): connection to eloomi
+        plan (UserSyncPlan): plan from plan_user_sync
+
+    Returns:
+        Dict[Str, List]: the users / emails whose write failed, by kind of write
+    """
+    failures = {'creates': [], 'updates': [], 'enables': [], 'disables': []}
+    for user in plan.creates:
+        if connection.create_user(user) is False or connection.update_user(user) is False:
+            failures['creates'].append(user)
+    for email in plan.enables:
+        if connection.enable_user(email) is False:
+            failures['enables'].append(email)
+    for user in plan.updates:
+        if connection.update_user(user) is False:
+            failures['updates'].append(user)
+    for email in plan.disables:
+        if connection.disable_user(email) is False:
+            failures['disables'].append(email)
+    connection.logger.info("User sync done {}, failures {}".format(
+        plan.summary(), { x: len(y) for x, y in failures.items() }))
+    return failures
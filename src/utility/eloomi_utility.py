@@ -1,3 +1,5 @@
+from utility.name_changes import split_name
+
 def get_department_id(e_departments, user):
     """Finds the ID of the eloomi department, for the user, if it does not exist it returns -1
 
@@ -27,6 +29,177 @@ def get_department_by_name(departments, name):
     Returns:
         Dict: Eloomi department
     """
+    if isinstance(departments, DepartmentIndex):
+        return departments.get_id_by_name(name)
     for d in departments: 
         if departments[d]['name'].lower() == name.strip().lower():
-            return departments[d]['id']
\ No newline at end of file
+            return departments[d]['id']
+
+def get_user_update_data(user):
+    """Builds the data that is sent to eloomi when updating a user
+
+    Args:
+        user (Dict): user with name, username, title, email, department_id and manager_id
+
+    Returns:
+        Dict: the data for the update request
+    """
+    first_name, last_name = split_name(user['name'])
+    return {
+        'first_name': first_name,
+        'last_name': last_name,
+        'username': user['username'].strip(),
+        'title': user['title'].strip(),
+        'email': user['email'].strip(),
+        'department_id': [str(user['department_id'])],
+        'direct_manager_ids': [user['manager_id']]
+    }
+
+
+def normalize_department_name(name):
+    """Normalizes a department name the same way get_department_by_name compares them
+
+    Args:
+        name (Str): Name of the department
+
+    Returns:
+        Str: stripped and lowercased name
+    """
+    return name.strip().lower()
+
+
+class DepartmentIndex(object):
+    """Index of the eloomi departments, built once from get_departments.
+    Looks departments up by normalized name, by code (mfld-department) and by id,
+    and keeps track of the parent / child hierarchy.
+    Can be used in place of the code mapped departments dict, e.g. in get_department_id.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, departments=None):
+        """Initializes the index
+
+        Args:
+            departments (List[EloomiDepartment] / Dict[Any, EloomiDepartment], optional): departments from get_departments,
+                                                                                         either as a list or a dict. Defaults to None.
+        """
+        self._by_id = {}
+        self._by_code = {}
+        self._by_name = {}
+        self._children = {}
+        if departments is not None:
+            values = departments.values() if isinstance(departments, dict) else departments
+            for department in values:
+                self.add(department)
+
+    def add(self, department):
+        """Adds the department to the index, replacing the department with the same id
+
+        Args:
+            department (EloomiDepartment): the department, needs to contain id, name, code and parent_id
+        """
+        if department['id'] in self._by_id:
+            self.remove(department['id'])
+        self._by_id[department['id']] = department
+        if department.get('code'):
+            self._by_code[department['code']] = department
+        if department.get('name'):
+            self._by_name.setdefault(normalize_department_name(department['name']), []).append(department['id'])
+        self._children.setdefault(department.get('parent_id'), set()).add(department['id'])
+
+    def update(self, department):
+        """Updates the department in the index, fields that are missing keep their old values
+
+        Args:
+            department (EloomiDepartment): the department, needs to contain the id
+        """
+        old = self._by_id.get(department['id'], {})
+        self.add(dict(old, **department))
+
+    def remove(self, department_id):
+        """Removes the department from the index
+
+        Args:
+            department_id (Int): ID of the department
+        """
+        department = self._by_id.pop(department_id, None)
+        if department is None:
+            return
+        if self._by_code.get(department.get('code')) is department:
+            del self._by_code[department['code']]
+        if department.get('name'):
+            name = normalize_department_name(department['name'])
+            ids = self._by_name.get(name, [])
+            if department_id in ids:
+                ids.remove(department_id)
+            if not ids:
+                self._by_name.pop(name, None)
+        self._children.get(department.get('parent_id'), set()).discard(department_id)
+
+    def by_id(self, department_id):
+        """Returns the department with the id, or None"""
+        return self._by_id.get(department_id)
+
+    def by_code(self, code):
+        """Returns the department with the code (mfld-department), or None"""
+        return self._by_code.get(code)
+
+    def by_name(self, name):
+        """Returns the first department with the name, compared case insensitive, or None"""
+        ids = self._by_name.get(normalize_department_name(name))
+        if not ids:
+            return None
+        return self._by_id[ids[0]]
+
+    def get_id_by_name(self, name):
+        """Returns the ID of the first department with the name, or None"""
+        department = self.by_name(name)
+        return department['id'] if department is not None else None
+
+    def parent(self, department_id):
+        """Returns the parent department of the department, or None"""
+        department = self._by_id.get(department_id)
+        if department is None:
+            return None
+        return self._by_id.get(department.get('parent_id'))
+
+    def children(self, department_id):
+        """Returns the departments directly under the department
+
+        Args:
+            department_id (Int): ID of the department, None gives the top level departments
+
+        Returns:
+            List[EloomiDepartment]: the child departments
+        """
+        return [self._by_id[x] for x in self._children.get(department_id, ())]
+
+    def descendants(self, department_id):
+        """Returns all the departments under the department, at any depth"""
+        result = []
+        stack = [department_id]
+        while stack:
+            for child in self.children(stack.pop()):
+                result.append(child)
+                stack.append(child['id'])
+        return result
+
+    def __getitem__(self, code):
+        department = self._by_code.get(code)
+        if department is None:
+            raise KeyError(code)
+        return department
+
+    def __contains__(self, code):
+        return code in self._by_code
+
+    def __iter__(self):
+        return iter(self._by_code)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def values(self):
+        """Returns all the departments"""
+        return list(self._by_id.values())
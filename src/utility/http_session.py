@@ -0,0 +1,99 @@
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that keeps a pool of keep-alive connections and applies a default timeout
+
+    Args:
+        HTTPAdapter (HTTPAdapter): Extends the requests HTTPAdapter
+    """
+    def __init__(self, timeout=None, **kwargs):
+        """Initializes the adapter
+
+        Args:
+            timeout (Float / Tuple[Float, Float], optional): Default (connect, read) timeout used when a request doesn't set one. Defaults to None.
+            **kwargs: passed on to HTTPAdapter, e.g. pool_connections, pool_maxsize, max_retries and pool_block
+        """
+        self.timeout = timeout
+        super(PooledHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        """Sends the prepared request, using the default timeout if none was given"""
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(PooledHTTPAdapter, self).send(request, **kwargs)
+
+    def connection_stats(self):
+        """Counts the connections opened and the requests sent through the pools of this adapter
+
+        Returns:
+            Dict: connections (Int), requests (Int) and reused (Int), the amount of requests that used an already open connection
+        """
+        connections = 0
+        sent = 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            sent += pool.num_requests
+        return {
+            'connections': connections,
+            'requests': sent,
+            'reused': max(sent - connections, 0),
+        }
+
+
+def create_session(pool_size=10, timeout=(5, 60), max_retries=0, pool_block=False, headers=None):
+    """Creates a requests Session with a keep-alive connection pool, that is meant to be shared
+    by every call a connection object makes
+
+    Args:
+        pool_size (Int, optional): Max amount of connections kept open per host. Defaults to 10.
+        timeout (Float / Tuple[Float, Float], optional): Default (connect, read) timeout in seconds. Defaults to (5, 60).
+        max_retries (Int, optional): Amount of retries on connection errors. Defaults to 0.
+        pool_block (Bool, optional): If True, requests wait for a free connection instead of opening extra ones. Defaults to False.
+        headers (Dict, optional): Headers sent with every request. Defaults to None.
+
+    Returns:
+        Session: the pooled session
+    """
+    session = Session()
+    adapter = PooledHTTPAdapter(timeout=timeout,
+                                pool_connections=pool_size,
+                                pool_maxsize=pool_size,
+                                max_retries=max_retries,
+                                pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # negotiate compression and keep the connections alive between calls
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    if headers is not None:
+        session.headers.update(headers)
+    return session
+
+
+def session_stats(session):
+    """Sums up the connection stats of all the pooled adapters mounted on the session
+
+    Args:
+        session (Session): session created with create_session
+
+    Returns:
+        Dict: connections (Int), requests (Int), reused (Int) and reuse_ratio (Float)
+    """
+    stats = {'connections': 0, 'requests': 0, 'reused': 0}
+    seen = set()
+    for adapter in session.adapters.values():
+        if not isinstance(adapter, PooledHTTPAdapter) or id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        for key, value in adapter.connection_stats().items():
+            stats[key] += value
+    stats['reuse_ratio'] = stats['reused'] / stats['requests'] if stats['requests'] else 0.0
+    return stats
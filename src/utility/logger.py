@@ -1,5 +1,22 @@
+import atexit
+import json
 import logging
+import queue
+import random
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# pass as extra to mark a log record as a bulky payload, e.g. logger.debug("Payload %s", data, extra=PAYLOAD)
+PAYLOAD = {'payload': True}
+
+
+def _log_name(path, script_name):
+    """Makes the path of the log file, named after the script and the current time"""
+    today = datetime.now().strftime("%Y-%b-%d-%H-%M")
+    if script_name != "":
+        return "{}/{}_{}.log".format(path, script_name, today)
+    return "{}/{}.log".format(path, today)
+
 
 def create_logger(path, script_name=""):
     """Creates a logger and logging file it logs into
@@ -7,15 +24,102 @@ def create_logger(path, script_name=""):
     Args:
         path (Str): Path to the log
     """
-    today = datetime.now().strftime("%Y-%b-%d-%H-%M")
-    logname = ""
-    if(script_name is not ""):
-        logname = "{}/{}_{}.log".format(path, script_name, today)
-    else:
-        logname = "{}/{}.log".format(path, today)
+    logname = _log_name(path, script_name)
     # creating log file and naming the logger
     logging.basicConfig(filename=logname,
                         format="%(asctime)s | %(levelname)s: %(message)s",
                         datefmt="%m/%d/%Y %I:%M:%S",
                         filemode="a",
-                        level=logging.DEBUG)
\ No newline at end of file
+                        level=logging.DEBUG)
+
+
+class PayloadFilter(logging.Filter):
+    """Samples and truncates the log records marked as payloads, other records pass untouched
+
+    Args:
+        logging.Filter (logging.Filter): Extends the logging Filter class
+    """
+    def __init__(self, max_length=1000, sample_rate=1.0):
+        """Initializes the filter
+
+        Args:
+            max_length (Int, optional): Max length of a payload message, None doesn't truncate. Defaults to 1000.
+            sample_rate (Float, optional): Share of the payload records that are kept, between 0 and 1. Defaults to 1.0.
+        """
+        super(PayloadFilter, self).__init__()
+        self.max_length = max_length
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if not getattr(record, 'payload', False):
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.max_length is not None:
+            message = record.getMessage()
+            if len(message) > self.max_length:
+                record.msg = "{}... ({} characters truncated)".format(message[:self.max_length], len(message) - self.max_length)
+                record.args = None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats log records as one json object per line. Records that went through a QueueHandler
+    already have their traceback in the message"""
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def create_queue_logger(path, script_name="", level=logging.INFO, levels=None, json_lines=False,
+                        max_payload_length=1000, payload_sample_rate=1.0):
+    """Creates a logging file that is written to by a background thread. Log calls only put the
+    record on a queue, so the file writes don't slow down the code that logs.
+
+    Args:
+        path (Str): Path to the log
+        script_name (Str, optional): Prefix of the log file name. Defaults to "".
+        level (Int, optional): Level of the root logger. Defaults to logging.INFO.
+        levels (Dict[Str, Int], optional): Level per logger name, e.g. {'utility.eloomi_connection': logging.DEBUG}. Defaults to None.
+        json_lines (Bool, optional): If True every record is written as a json object on its own line. Defaults to False.
+        max_payload_length (Int, optional): Max length of payload messages, None doesn't truncate. Defaults to 1000.
+        payload_sample_rate (Float, optional): Share of the payload records that are logged. Defaults to 1.0.
+
+    Returns:
+        QueueListener: the running listener, stop it to flush the queue. It is also stopped when the script exits
+    """
+    handler = logging.FileHandler(_log_name(path, script_name), mode="a", encoding="utf-8")
+    if json_lines:
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s: %(message)s",
+                                               datefmt="%m/%d/%Y %I:%M:%S"))
+
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    # filtered before the record is queued, so dropped payloads are never formatted
+    queue_handler.addFilter(PayloadFilter(max_payload_length, payload_sample_rate))
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener):
+    """Stops the listener if it is still running, writing whatever is left on the queue"""
+    if listener._thread is not None:
+        listener.stop()
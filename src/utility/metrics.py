@@ -0,0 +1,200 @@
+import bisect
+import os
+import re
+import tempfile
+import threading
+from urllib.parse import urlsplit
+
+# upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# path segments that are ids rather than part of the endpoint, e.g. numbers, guids, kennitala and emails
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}|[^/]*@[^/]*)$')
+
+
+def endpoint_template(url):
+    """Turns a url into the endpoint it calls, with the ids replaced, so calls can be grouped
+
+    Args:
+        url (Str): url of the request, e.g. https://api.eloomi.com/v3/courses/123/participants?page=2
+
+    Returns:
+        Str: the endpoint, e.g. v3/courses/{id}/participants
+    """
+    path = urlsplit(url).path.strip('/')
+    return '/'.join(['{id}' if _ID_SEGMENT.match(x) else x for x in path.split('/')])
+
+
+class _EndpointStats(object):
+    """Counters of one endpoint"""
+    def __init__(self, buckets):
+        self.calls = 0
+        self.errors = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(buckets) + 1)
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.ratelimit_wait = 0.0
+
+
+class RequestMetrics(object):
+    """Thread safe per-endpoint metrics of the requests made by an api client: call counts,
+    latency histograms, response sizes, status codes, retries and time spent waiting on the rate limit
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, service, buckets=DEFAULT_BUCKETS):
+        """Initializes the metrics
+
+        Args:
+            service (Str): name of the api, e.g. 'eloomi' or 'nightingale'
+            buckets (Tuple[Float], optional): upper bounds of the latency buckets in seconds. Defaults to DEFAULT_BUCKETS.
+        """
+        self.service = service
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, method, url, status, seconds, size=0, retries=0, ratelimit_wait=0.0):
+        """Records one request
+
+        Args:
+            method (Str): HTTP method
+            url (Str): url of the request, grouped by endpoint_template
+            status (Int / Str): status code of the final response, or 'error' if no response came
+            seconds (Float): time spent on the request, without the rate limit wait
+            size (Int, optional): size of the response body in bytes. Defaults to 0.
+            retries (Int, optional): amount of times the request was sent again. Defaults to 0.
+            ratelimit_wait (Float, optional): seconds spent waiting on the rate limiter. Defaults to 0.0.
+        """
+        key = (method.upper(), endpoint_template(url))
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = _EndpointStats(self.buckets)
+            stats.calls += 1
+            status = str(status)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if not status.startswith('2'):
+                stats.errors += 1
+            stats.buckets[bisect.bisect_left(self.buckets, seconds)] += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes += size
+            stats.retries += retries
+            stats.ratelimit_wait += ratelimit_wait
+
+    def reset(self):
+        """Removes everything recorded so far"""
+        with self._lock:
+            self._endpoints = {}
+
+    def _quantile(self, stats, q):
+        """Estimates a latency quantile as the upper bound of the bucket it falls into"""
+        rank = q * stats.calls
+        seen = 0
+        for bound, count in zip(self.buckets + (stats.max_seconds,), stats.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, stats.max_seconds)
+        return stats.max_seconds
+
+    def summary(self):
+        """Summarizes the requests per endpoint
+
+        Returns:
+            Dict[Str, Dict]: calls, errors, statuses, seconds, mean_seconds, p50_seconds, p95_seconds, max_seconds,
+                             bytes, retries and ratelimit_wait per 'METHOD endpoint', slowest total first
+        """
+        with self._lock:
+            items = sorted(self._endpoints.items(), key=lambda x: x[1].seconds, reverse=True)
+            return {
+                '{} {}'.format(*key): {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'statuses': dict(stats.statuses),
+                    'seconds': stats.seconds,
+                    'mean_seconds': stats.seconds / stats.calls,
+                    'p50_seconds': self._quantile(stats, 0.5),
+                    'p95_seconds': self._quantile(stats, 0.95),
+                    'max_seconds': stats.max_seconds,
+                    'bytes': stats.bytes,
+                    'retries': stats.retries,
+                    'ratelimit_wait': stats.ratelimit_wait,
+                }
+                for key, stats in items
+            }
+
+    def log_summary(self, logger):
+        """Logs one line per endpoint, meant to be called at the end of a run
+
+        Args:
+            logger (Logger): logger the summary is written to
+        """
+        for endpoint, x in self.summary().items():
+            logger.info("%s %s: %s calls, %s errors, %.1f sec total, %.3f sec mean, %.3f sec p95, %s bytes, %s retries, %.1f sec rate limited",
+                        self.service, endpoint, x['calls'], x['errors'], x['seconds'], x['mean_seconds'],
+                        x['p95_seconds'], x['bytes'], x['retries'], x['ratelimit_wait'])
+
+    def prometheus_text(self):
+        """Renders the metrics in the Prometheus text format
+
+        Returns:
+            Str: the metrics
+        """
+        # every metric is written as one group, as the format requires
+        families = [
+            ('api_requests_total', 'counter', []),
+            ('api_request_duration_seconds', 'histogram', []),
+            ('api_response_bytes_total', 'counter', []),
+            ('api_retries_total', 'counter', []),
+            ('api_ratelimit_wait_seconds_total', 'counter', []),
+        ]
+        requests, duration, size, retries, wait = [x[2] for x in families]
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                labels = 'service="{}",method="{}",endpoint="{}"'.format(_escape(self.service), method, _escape(endpoint))
+                for status, count in sorted(stats.statuses.items()):
+                    requests.append('api_requests_total{{{},status="{}"}} {}'.format(labels, status, count))
+                cumulative = 0
+                for bound, count in zip(self.buckets, stats.buckets):
+                    cumulative += count
+                    duration.append('api_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(labels, bound, cumulative))
+                duration.append('api_request_duration_seconds_bucket{{{},le="+Inf"}} {}'.format(labels, stats.calls))
+                duration.append('api_request_duration_seconds_sum{{{}}} {}'.format(labels, stats.seconds))
+                duration.append('api_request_duration_seconds_count{{{}}} {}'.format(labels, stats.calls))
+                size.append('api_response_bytes_total{{{}}} {}'.format(labels, stats.bytes))
+                retries.append('api_retries_total{{{}}} {}'.format(labels, stats.retries))
+                wait.append('api_ratelimit_wait_seconds_total{{{}}} {}'.format(labels, stats.ratelimit_wait))
+        lines = []
+        for name, kind, samples in families:
+            lines.append('# TYPE {} {}'.format(name, kind))
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Writes the metrics to a Prometheus text file, e.g. for the node exporter textfile collector.
+        The file is replaced in one go, so it is never read half written
+
+        Args:
+            path (Str): path of the .prom file
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.prometheus_text())
+            # mkstemp makes the file readable by the owner only, the collector may run as another user
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def _escape(value):
+    """Escapes a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -1,53 +1,186 @@
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from os import getenv, truncate, uname_result
-from requests import NullHandler, post, get
+from requests import NullHandler, RequestException
 from datetime import datetime
 
 from requests.api import head
+from utility.async_connection import AsyncConnection
+from utility.http_session import create_session, session_stats
+from utility.logger import PAYLOAD
+from utility.metrics import RequestMetrics
+from utility.token_manager import TokenManager, credential_key, jwt_expires_in
 class NightingaleConnection(): 
     """
         This class is used to connect to the Nightingale API
     """
-    def __init__(self):
+    def __init__(self, cache=None, token_cache_path=None, pool_size=10, timeout=(5, 60), max_retries=0, metrics=None):
         """Intilaizes the class, generating header, bearer token and fetching the endpoint from the env file
+
+        Args:
+            cache (SnapshotCache, optional): On-disk cache of indices, measurements, departments and users. Defaults to None.
+            token_cache_path (Str, optional): Path to a json file the token is cached in between runs. Defaults to None.
+            pool_size (Int, optional): Max amount of keep-alive connections to the API. Defaults to 10.
+            timeout (Float / Tuple[Float, Float], optional): Default (connect, read) timeout in seconds. Defaults to (5, 60).
+            max_retries (Int, optional): Amount of retries on connection errors. Defaults to 0.
+            metrics (RequestMetrics, optional): Per-endpoint request metrics, pass the same one to combine connections. Defaults to a new RequestMetrics.
            
         Instance Variables
             endpoint:           String containing the value of the base url
             token:              String containing the Bearer token
+            token_manager:      caches the token per user and refreshes it before it expires
             headers:            Object containing Content-Type, and authorization
+            cache:              optional snapshot cache, kept up to date by the writes made through this object
+            tenant:             key of the cached snapshots, made from the endpoint and username
+            session:            pooled keep-alive session, shared by every call made by this object
+            metrics:            per-endpoint latency, status, size and retry metrics of every request
+            index_codes:        indices mapped by index_code, filled by get_indices and kept up to date by the create methods
+            measurement_codes:  measurements mapped by measurement_code, filled by get_measurements and kept up to date by create_measurement
         """
         self.endpoint = getenv("NIGHTINGALE_ENDPOINT")
-        self.token = self.generate_token()
+        self.cache = cache
+        self.tenant = "{}|{}".format(self.endpoint, getenv("NIGHTINGALE_USERNAME"))
+        self.index_codes = None
+        self.measurement_codes = None
+        # the code caches are filled once and updated by worker threads, so they are guarded by locks
+        self._codes_lock = threading.Lock()
+        self._index_fill_lock = threading.Lock()
+        self._measurement_fill_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.session = create_session(pool_size=pool_size, timeout=timeout, max_retries=max_retries)
+        self.metrics = metrics if metrics is not None else RequestMetrics('nightingale')
+        self.token_manager = TokenManager(credential_key(self.endpoint, getenv("NIGHTINGALE_USERNAME"), getenv("NIGHTINGALE_PASSWORD")),
+                                          self._fetch_token, cache_path=token_cache_path)
+        self.token = self.token_manager.get_token()
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': "Bearer {}".format(self.token)
         }
-        self.logger = logging.getLogger(__name__)
+
+    def connection_stats(self):
+        """Returns how many connections the session has opened and how often they were reused
+
+        Returns:
+            Dict: connections (Int), requests (Int), reused (Int) and reuse_ratio (Float)
+        """
+        return session_stats(self.session)
+
+    def close(self):
+        """Closes all the pooled connections"""
+        self.session.close()
+
+    def _set_token(self, token):
+        """Sets the token used by the requests of this object, if it is a valid token"""
+        if token and token != self.token:
+            self.token = token
+            self.headers['Authorization'] = "Bearer {}".format(token)
+
+    def _request(self, method, url, **kwargs):
+        """Sends a request with the current token. If the token gets rejected with a 401
+        it is refreshed once, by one thread only, and the request is retried.
+
+        Args:
+            method (Str): HTTP method
+            url (Str): url of the request
+            **kwargs: passed on to requests, e.g. data and headers
+
+        Returns:
+            Response: the response from Nightingale
+        """
+        self._set_token(self.token_manager.get_token())
+        token = self.token
+        headers = dict(kwargs.pop('headers', self.headers))
+        headers['Authorization'] = "Bearer {}".format(token)
+        retries = 0
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            if response.status_code == 401:
+                self.logger.warning("Token was rejected, refreshing it")
+                self._set_token(self.token_manager.refresh(token))
+                headers['Authorization'] = "Bearer {}".format(self.token)
+                retries = 1
+                response = self.session.request(method, url, headers=headers, **kwargs)
+        except RequestException:
+            self.metrics.record(method, url, 'error', time.perf_counter() - start, retries=retries)
+            raise
+        self.metrics.record(method, url, response.status_code, time.perf_counter() - start,
+                            size=len(response.content), retries=retries)
+        return response
+
+    def invalidate_cache(self, endpoint=None):
+        """Removes the cached snapshots of this tenant, or only the one of the endpoint
+
+        Args:
+            endpoint (Str, optional): 'indices', 'measurements', 'departments' or 'users'. Defaults to None.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(self.tenant, endpoint)
+
+    def _cache_get(self, endpoint):
+        """Returns the cached snapshot of the endpoint, or None if there is no cache or no live snapshot"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self.tenant, endpoint)
+
+    def _cache_set(self, endpoint, data):
+        """Stores the snapshot of the endpoint, if caching is enabled"""
+        if self.cache is not None:
+            self.cache.set(self.tenant, endpoint, data)
+
+    def _cache_upsert(self, endpoint, record, key='id'):
+        """Updates a record in the cached snapshot of the endpoint, if caching is enabled"""
+        if self.cache is not None:
+            self.cache.upsert_record(self.tenant, endpoint, record, key)
+
+    def _remember_index(self, index):
+        """Adds a newly created index to the code cache and the snapshot cache"""
+        with self._codes_lock:
+            if self.index_codes is not None:
+                self.index_codes[index['index_code']] = index
+        self._cache_upsert('indices', index, 'index_code')
+
+    def _remember_measurement(self, measurement):
+        """Adds a newly created measurement to the code cache and the snapshot cache"""
+        with self._codes_lock:
+            if self.measurement_codes is not None:
+                self.measurement_codes[measurement['measurement_code']] = measurement
+        self._cache_upsert('measurements', measurement, 'measurement_code')
     
     def generate_token(self):
         """
             Calls the Nightingale API with the username and password 
             to get a Bearer token. 
         """
+        return self._fetch_token()[0]
+
+    def _fetch_token(self):
+        """
+            Creates a new Bearer token, used by the token manager.
+            Returns the token and the seconds until it expires, read from the token itself
+        """
         url = "{}/{}/".format(self.endpoint, "token")
         data = {
             "email": getenv("NIGHTINGALE_USERNAME"),
             "password": getenv("NIGHTINGALE_PASSWORD")
         }
 
-        response = post(url=url, data=json.dumps(data), headers={'Content-Type': 'application/json'})
+        response = self.session.post(url=url, data=json.dumps(data), headers={'Content-Type': 'application/json'})
         response.encoding = "utf-8"
 
         # status code 200 means the token got created
         if response.status_code == 200:
             data = response.json()['results'][0]
-            return data['access']
+            return data['access'], jwt_expires_in(data['access'])
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
             print(response.text)
         else:
             print("Something Went Wrong Generating Token: {}".format(response.json()['response_message']))
+        return None, None
 
 
     def create_course_index(self, course, index_code):
@@ -64,13 +197,14 @@ class NightingaleConnection():
             "visibility_id": 4
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created index for course: {}".format(data['name']))
+            self._remember_index(data)
             return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -97,13 +231,14 @@ class NightingaleConnection():
             }]
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created index for company: {}".format(data['name']))
+            self._remember_index(data)
             return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -138,13 +273,14 @@ class NightingaleConnection():
             }]
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created measurement for department: {}".format(data['name']))
+            self._remember_measurement(data)
             return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -155,7 +291,8 @@ class NightingaleConnection():
     def create_measurement_value(self, measurement_id, assigned, finished):
         """
             This is used when a measurement already exists. 
-            This method creates a new measurement value for a specific measurement
+            This method creates a new measurement value for a specific measurement.
+            Returns the id of the new measurement value, or None if it failed
         """
         url = "{}/{}/".format(self.endpoint, "measurement-values")
         data = {
@@ -165,22 +302,77 @@ class NightingaleConnection():
             "comment": "min: {} max(Fjöldi starfsmanna skráð á námskeiðið): {} Fjöldi klárað: {}".format(0, assigned, finished)
             }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created measurement value: {}".format(data['id']))
+            return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
             print(response.text)
         else: 
             print("Something Went Wrong Creating measurement value {}".format(response.json()['response_message']))
 
+    def publish_measurement_values(self, entries, max_workers=8, store=None, heartbeat=None):
+        """
+            Creates measurement values for many measurements at once, using a pool of workers
+            that share the pooled session. A value that fails is recorded and the rest carry on.
+            When a store is given, values that haven't changed since they were last published
+            are skipped, unless the last one is older than the heartbeat.
+
+        Args:
+            entries (Iterable[Tuple[Str, Int, Int]]): (measurement_id, assigned, finished) for every value
+            max_workers (int, optional): Max amount of values sent at the same time. Defaults to 8.
+            store (PublishedValueStore, optional): Store of the last value published per measurement. Defaults to None.
+            heartbeat (Int, optional): Overrides the heartbeat of the store, in seconds. Defaults to None.
+
+        Returns:
+            Dict: published (Dict[measurement_id, value_id]), failed (Dict[measurement_id, Str]),
+                  skipped (List[measurement_id]), seconds (Float) and per_second (Float)
+        """
+        published = {}
+        failed = {}
+        skipped = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for entry in entries:
+                if store is not None and not store.is_due(self.tenant, *entry, heartbeat=heartbeat):
+                    skipped.append(entry[0])
+                    continue
+                futures[executor.submit(self.create_measurement_value, *entry)] = entry
+            for future in as_completed(futures):
+                measurement_id, assigned, finished = futures[future]
+                try:
+                    value_id = future.result()
+                except Exception as e:
+                    failed[measurement_id] = str(e)
+                    continue
+                if value_id is None:
+                    failed[measurement_id] = "Creating measurement value failed"
+                else:
+                    published[measurement_id] = value_id
+                    if store is not None:
+                        store.record(self.tenant, measurement_id, assigned, finished)
+        seconds = time.perf_counter() - start
+        total = len(published) + len(failed)
+        self.logger.info("Published {} measurement values in {:.1f} sec, {} failed, {} unchanged skipped".format(
+            len(published), seconds, len(failed), len(skipped)))
+        return {
+            'published': published,
+            'failed': failed,
+            'skipped': skipped,
+            'seconds': seconds,
+            'per_second': total / seconds if seconds > 0 else 0.0,
+        }
+
     def create_measurement_index_connection(self, measurement_id, index_id):
         """
-            This method creates a connection between a measurement and index
+            This method creates a connection between a measurement and index.
+            Returns the id of the new connection, or None if it failed
         """
         url = "{}/{}/".format(self.endpoint, "index-measurement-connections")
         data = {
@@ -189,13 +381,14 @@ class NightingaleConnection():
                 "measurement_id": measurement_id
             }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created Connection Betweeon {} and {}".format(measurement_id, index_id))
+            return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
             print(response.text)
@@ -207,15 +400,22 @@ class NightingaleConnection():
         """
             Fetches all the indices from the Nightingale API
         """
+        cached = self._cache_get('indices')
+        if cached is not None:
+            self.index_codes = dict(cached)
+            return cached
+
         url = "{}/{}/?page_size=0".format(self.endpoint, "indices")
 
-        response = get(url=url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
         response.encoding = "utf-8"
 
         # statuscode 200 means the query was successful
         if response.status_code == 200: 
             data = response.json()['results']
             mapped_data = { x['index_code']: x for x in data }
+            self.index_codes = dict(mapped_data)
+            self._cache_set('indices', mapped_data)
             return mapped_data
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -224,14 +424,25 @@ class NightingaleConnection():
         else:
             raise ValueError("Something Went Wrong Fetching The Indices {}".format(response.json()['response_message']))
     
-    def get_indices_by_code(self, code): 
-        """Gets all the indices that have the code included in them
+    def get_indices_by_code(self, code, use_cache=True, exact=False): 
+        """Gets all the indices that have the code included in them.
+        Answered from the code cache, which is filled by one call to get_indices the first time it is needed
 
         Args:
             code (Str): index_code in NightinGale
+            use_cache (Bool, optional): If False the API is asked directly. Defaults to True.
+            exact (Bool, optional): If True only the index with exactly this code is returned. Defaults to False.
         """
+        if use_cache:
+            if self.index_codes is None:
+                with self._index_fill_lock:
+                    if self.index_codes is None:
+                        self.get_indices()
+            with self._codes_lock:
+                return _match_codes(self.index_codes, code, exact)
+
         url = "{}/{}/?page_size=0&code={}".format(self.endpoint, "indices", code)
-        response = get(url=url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
         response.encoding = "utf-8"
 
         # statuscode 200 means the query was successful
@@ -249,15 +460,22 @@ class NightingaleConnection():
         """
             Fetches all the measurements from the Nightingale API
         """
+        cached = self._cache_get('measurements')
+        if cached is not None:
+            self.measurement_codes = dict(cached)
+            return cached
+
         url = "{}/{}/?page_size=0".format(self.endpoint, "measurements")
 
-        response = get(url=url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
         response.encoding = "utf-8"
 
         # statuscode 200 means the query was successful
         if response.status_code == 200: 
             data = response.json()['results']
             mapped_data = { x['measurement_code']: x for x in data }
+            self.measurement_codes = dict(mapped_data)
+            self._cache_set('measurements', mapped_data)
             return mapped_data
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -265,14 +483,27 @@ class NightingaleConnection():
         else:
             print("Something Went Wrong Fetching The Measurements {}".format(response.json()['response_message']))
 
-    def get_measurements_by_code(self, code): 
-        """Gets all the measurements that have the code included in them
+    def get_measurements_by_code(self, code, use_cache=True, exact=False): 
+        """Gets all the measurements that have the code included in them.
+        Answered from the code cache, which is filled by one call to get_measurements the first time it is needed
 
         Args:
             code (Str): index_code in NightinGale
+            use_cache (Bool, optional): If False the API is asked directly. Defaults to True.
+            exact (Bool, optional): If True only the measurement with exactly this code is returned. Defaults to False.
         """
+        if use_cache:
+            if self.measurement_codes is None:
+                with self._measurement_fill_lock:
+                    if self.measurement_codes is None:
+                        self.get_measurements()
+            # get_measurements doesn't raise when it fails, then the API is asked directly
+            with self._codes_lock:
+                if self.measurement_codes is not None:
+                    return _match_codes(self.measurement_codes, code, exact)
+
         url = "{}/{}/?page_size=0&code={}".format(self.endpoint, "measurements", code)
-        response = get(url=url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
         response.encoding = "utf-8"
 
         # statuscode 200 means the query was successful
@@ -301,13 +532,14 @@ class NightingaleConnection():
             "measurement_connections": [{"measurement_id": x, "percentage": None} for x in children]
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created index for course: {}".format(data['name']))
+            self._remember_index(data)
             return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -331,13 +563,14 @@ class NightingaleConnection():
             "child_index_connections": [{"child_index_id": x, "percentage": None} for x in children]
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         
         # statuscode 201 means Created
         if response.status_code == 201: 
             data = response.json()['results'][0]
             print("Successfully Created index for course: {}".format(data['name']))
+            self._remember_index(data)
             return data['id']
         # 500, server error, and it has a different format than other responses
         elif response.status_code == 500:
@@ -353,13 +586,19 @@ class NightingaleConnection():
             ValueError: [description]
             ValueError: [description]
         """
+        cached = self._cache_get('departments')
+        if cached is not None:
+            return cached
+
         url = "{}/{}/?page_size=0".format(self.endpoint, "departments")
-        response = get(url=url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
 
         response.encoding = "utf-8"
         if response.status_code == 200:
             data = response.json()["results"]
-            self.logger.info("Successfully fetched all departments {}".format(data))
+            self.logger.info("Successfully fetched all departments (%s)", len(data))
+            self.logger.debug("Departments %s", data, extra=PAYLOAD)
+            self._cache_set('departments', data)
             return data
         elif response.status_code == 500:
             self.logger.error("Server error 500, failed on getting departments")
@@ -394,6 +633,9 @@ class NightingaleConnection():
             security_group_id (Guid, optional): Guid of the security group. Defaults to None.
             project_connection_list (object(project_connection_list), optional): [description]. Defaults to None.
 
+        Returns:
+            Dict: the created department
+
         Raises:
             ValueError: [description]
             ValueError: [description]
@@ -417,11 +659,13 @@ class NightingaleConnection():
             "project_connection_list": project_connection_list
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         if response.status_code == 201:
             data = response.json()["results"][0]
             self.logger.info("Successfully created department {}".format(data))
+            self._cache_upsert('departments', data)
+            return data
         elif response.status_code == 500:
             self.logger.error("Server error 500, failed on {}".format(data))
             self.logger.error("Response: {}".format(response.text))
@@ -439,13 +683,19 @@ class NightingaleConnection():
             ValueError: [description]
         """
 
+        cached = self._cache_get('users')
+        if cached is not None:
+            return cached
+
         url = "{}/{}/?page_size=0".format(self.endpoint, "accounts")
-        response = get(url=url, headers=self.headers)
+        response = self._request('GET', url, headers=self.headers)
 
         response.encoding = "utf-8"
         if response.status_code == 200:
             data = response.json()["results"]
-            self.logger.info("Successfully fetched all users {}".format(data))
+            self.logger.info("Successfully fetched all users (%s)", len(data))
+            self.logger.debug("Users %s", data, extra=PAYLOAD)
+            self._cache_set('users', data)
             return data
         elif response.status_code == 500:
             self.logger.error("Server error 500, failed on getting users")
@@ -469,11 +719,14 @@ class NightingaleConnection():
             entity_role_id ([type], optional): [description]. Defaults to None.
             is_active (bool, optional): Tells if the user is active or not, make false if you want to "delete" user. Defaults to True.
 
+        Returns:
+            Dict: the created user
+
         Raises:
             ValueError: [description]
             ValueError: [description]
         """
-        url = "{}/{}/".format(self.endpoint, "departments")
+        url = "{}/{}/".format(self.endpoint, "accounts")
         data = {
             "email": email,
             "culture_id": culture_id,
@@ -485,11 +738,13 @@ class NightingaleConnection():
             "is_active": is_active
         }
 
-        response = post(url=url, data=json.dumps(data), headers=self.headers)
+        response = self._request('POST', url, data=json.dumps(data), headers=self.headers)
         response.encoding = "utf-8"
         if response.status_code == 201:
             data = response.json()["results"][0]
             self.logger.info("Successfully created user {}".format(data))
+            self._cache_upsert('users', data)
+            return data
         elif response.status_code == 500:
             self.logger.error("Server error 500, failed on {}".format(data))
             self.logger.error("Response: {}".format(response.text))
@@ -499,3 +754,107 @@ class NightingaleConnection():
             self.logger.error(response.text)
             raise ValueError("Unknown error check logs for details")
 
+
+
+class AsyncNightingaleConnection(AsyncConnection):
+    """Asyncio variant of NightingaleConnection, with the same create and get methods as coroutines.
+    The requests share one pooled session, and at most `concurrency` of them run at the same time.
+
+    Args:
+        AsyncConnection (AsyncConnection): Extends the AsyncConnection class
+    """
+    def __init__(self, concurrency=10, cache=None, token_cache_path=None, timeout=(5, 60), max_retries=0, metrics=None):
+        """Intilaizes the class, creating the NightingaleConnection the requests are made through
+
+        Args:
+            concurrency (Int, optional): Max amount of requests running at the same time, also used as the pool size. Defaults to 10.
+            cache (SnapshotCache, optional): On-disk cache of indices, measurements, departments and users. Defaults to None.
+            token_cache_path (Str, optional): Path to a json file the token is cached in between runs. Defaults to None.
+            timeout (Float / Tuple[Float, Float], optional): Default (connect, read) timeout in seconds. Defaults to (5, 60).
+            max_retries (Int, optional): Amount of retries on connection errors. Defaults to 0.
+            metrics (RequestMetrics, optional): Per-endpoint request metrics. Defaults to a new RequestMetrics.
+        """
+        connection = NightingaleConnection(cache=cache, token_cache_path=token_cache_path, pool_size=concurrency,
+                                           timeout=timeout, max_retries=max_retries, metrics=metrics)
+        super(AsyncNightingaleConnection, self).__init__(connection, concurrency=concurrency)
+        self.logger = connection.logger
+        self.metrics = connection.metrics
+
+    def connection_stats(self):
+        """Returns how many connections the session has opened and how often they were reused"""
+        return self.connection.connection_stats()
+
+    async def create_course_index(self, course, index_code):
+        """Async version of NightingaleConnection.create_course_index"""
+        return await self._run(self.connection.create_course_index, course, index_code)
+
+    async def create_company_index(self, name, description, index_code, parent_id):
+        """Async version of NightingaleConnection.create_company_index"""
+        return await self._run(self.connection.create_company_index, name, description, index_code, parent_id)
+
+    async def create_measurement(self, name, description, index_code, parent_id, assigned, finished):
+        """Async version of NightingaleConnection.create_measurement"""
+        return await self._run(self.connection.create_measurement, name, description, index_code, parent_id, assigned, finished)
+
+    async def create_measurement_value(self, measurement_id, assigned, finished):
+        """Async version of NightingaleConnection.create_measurement_value"""
+        return await self._run(self.connection.create_measurement_value, measurement_id, assigned, finished)
+
+    async def create_measurement_index_connection(self, measurement_id, index_id):
+        """Async version of NightingaleConnection.create_measurement_index_connection"""
+        return await self._run(self.connection.create_measurement_index_connection, measurement_id, index_id)
+
+    async def get_indices(self):
+        """Async version of NightingaleConnection.get_indices"""
+        return await self._run(self.connection.get_indices)
+
+    async def get_indices_by_code(self, code, use_cache=True, exact=False):
+        """Async version of NightingaleConnection.get_indices_by_code"""
+        return await self._run(self.connection.get_indices_by_code, code, use_cache, exact)
+
+    async def get_measurements(self):
+        """Async version of NightingaleConnection.get_measurements"""
+        return await self._run(self.connection.get_measurements)
+
+    async def get_measurements_by_code(self, code, use_cache=True, exact=False):
+        """Async version of NightingaleConnection.get_measurements_by_code"""
+        return await self._run(self.connection.get_measurements_by_code, code, use_cache, exact)
+
+    async def create_combination_index(self, index_code, children, name, description):
+        """Async version of NightingaleConnection.create_combination_index"""
+        return await self._run(self.connection.create_combination_index, index_code, children, name, description)
+
+    async def create_combination_index_index(self, index_code, children, name, description):
+        """Async version of NightingaleConnection.create_combination_index_index"""
+        return await self._run(self.connection.create_combination_index_index, index_code, children, name, description)
+
+    async def get_departments(self):
+        """Async version of NightingaleConnection.get_departments"""
+        return await self._run(self.connection.get_departments)
+
+    async def create_department(self, entity_id, name, **kwargs):
+        """Async version of NightingaleConnection.create_department"""
+        return await self._run(self.connection.create_department, entity_id, name, **kwargs)
+
+    async def get_users(self):
+        """Async version of NightingaleConnection.get_users"""
+        return await self._run(self.connection.get_users)
+
+    async def create_user(self, email, culture_id, **kwargs):
+        """Async version of NightingaleConnection.create_user"""
+        return await self._run(self.connection.create_user, email, culture_id, **kwargs)
+
+def _match_codes(mapped_data, code, exact):
+    """Finds the records whose code includes the code
+
+    Args:
+        mapped_data (Dict[Str, Dict]): records mapped by code
+        code (Str): the code
+        exact (Bool): only return the record with exactly this code
+
+    Returns:
+        List[Dict]: the matching records
+    """
+    if exact:
+        return [mapped_data[code]] if code in mapped_data else []
+    return [x for key, x in list(mapped_data.items()) if key is not None and code in key]
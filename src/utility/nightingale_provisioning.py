@@ -0,0 +1,200 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def email_key(email):
+    """Normalizes an email so it can be used to look up accounts"""
+    return email.strip().lower() if email else None
+
+
+def ledger_key(general_ledger_number):
+    """Normalizes a general ledger number so numbers and strings match"""
+    return str(general_ledger_number).strip() if general_ledger_number is not None else None
+
+
+def index_accounts(users):
+    """Maps the Nightingale accounts by email
+
+    Args:
+        users (List[Dict]): accounts from NightingaleConnection.get_users
+
+    Returns:
+        Dict[Str, Dict]: the accounts mapped by normalized email
+    """
+    return { email_key(x.get('email')): x for x in users if x.get('email') }
+
+
+def index_departments(departments):
+    """Maps the Nightingale departments by general ledger number
+
+    Args:
+        departments (List[Dict]): departments from NightingaleConnection.get_departments
+
+    Returns:
+        Dict[Str, Dict]: the departments mapped by normalized general ledger number
+    """
+    return { ledger_key(x.get('general_ledger_number')): x for x in departments if x.get('general_ledger_number') is not None }
+
+
+class ProvisioningPlan(object):
+    """The departments and users missing from Nightingale
+
+    Args:
+        object (object): Extends the Class Object
+
+    Instance Variables
+        departments:    List of the departments to create, as create_department arguments
+        users:          List of the users to create, as create_user arguments
+        accounts:       existing accounts mapped by email
+        ledger:         existing departments mapped by general ledger number
+    """
+    def __init__(self, departments, users, accounts, ledger):
+        self.departments = departments
+        self.users = users
+        self.accounts = accounts
+        self.ledger = ledger
+
+    def is_empty(self):
+        """Returns True if nothing is missing"""
+        return not self.departments and not self.users
+
+    def summary(self):
+        """Returns how many departments and users are missing"""
+        return {'departments': len(self.departments), 'users': len(self.users)}
+
+
+class NightingaleProvisioner(object):
+    """Creates the departments and users that are missing from Nightingale. The existing ones are
+    downloaded once and indexed, departments are created before the users that belong to them,
+    and each step runs on a pool of workers.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, connection, max_workers=8):
+        """Initializes the provisioner
+
+        Args:
+            connection (NightingaleConnection): connection to Nightingale
+            max_workers (int, optional): Max amount of departments / users created at the same time. Defaults to 8.
+        """
+        self.connection = connection
+        self.max_workers = max_workers
+
+    def plan(self, departments, users):
+        """Works out which departments and users are missing
+
+        Args:
+            departments (List[Dict]): desired departments, as create_department arguments. The parent can be given
+                                      with head_general_ledger_number instead of head_department_id
+            users (List[Dict]): desired users, as create_user arguments. The department can be given
+                                with general_ledger_number instead of department_id
+
+        Returns:
+            ProvisioningPlan: the missing departments and users
+        """
+        accounts = index_accounts(self.connection.get_users())
+        ledger = index_departments(self.connection.get_departments())
+        missing_departments = []
+        planned = set()
+        for department in departments:
+            key = ledger_key(department.get('general_ledger_number'))
+            if key is None or (key not in ledger and key not in planned):
+                missing_departments.append(department)
+                if key is not None:
+                    planned.add(key)
+        missing_users = []
+        planned = set()
+        for user in users:
+            key = email_key(user.get('email'))
+            # the same email twice is only created once
+            if key not in accounts and key not in planned:
+                missing_users.append(user)
+                planned.add(key)
+        return ProvisioningPlan(missing_departments, missing_users, accounts, ledger)
+
+    def _create_department(self, department, ledger):
+        """Creates the department, resolving the ledger number of its parent"""
+        arguments = dict(department)
+        head = ledger_key(arguments.pop('head_general_ledger_number', None))
+        if head is not None:
+            arguments['head_department_id'] = ledger[head]['id']
+            arguments.setdefault('head_department_name', ledger[head].get('name'))
+        return self.connection.create_department(**arguments)
+
+    def _create_user(self, user, ledger):
+        """Creates the user, resolving the ledger number of its department"""
+        arguments = dict(user)
+        key = ledger_key(arguments.pop('general_ledger_number', None))
+        if key is not None:
+            arguments['department_id'] = ledger[key]['id']
+        return self.connection.create_user(**arguments)
+
+    def _run(self, executor, items, create, ledger, failed, key):
+        """Creates the items concurrently, returns the created records mapped by key"""
+        created = {}
+        futures = { executor.submit(create, x, ledger): x for x in items }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                created[key(item)] = future.result()
+            except Exception as e:
+                failed[key(item)] = str(e)
+        return created
+
+    def provision(self, departments, users, plan=None):
+        """Creates the missing departments and then the missing users.
+        Departments are created level by level, so parents exist before their children,
+        and users whose department couldn't be created are reported as failed.
+
+        Args:
+            departments (List[Dict]): desired departments, see plan
+            users (List[Dict]): desired users, see plan
+            plan (ProvisioningPlan, optional): plan made earlier. Defaults to making a new one.
+
+        Returns:
+            Dict: departments (Dict[Str, Dict]) created departments by ledger number / name,
+                  users (Dict[Str, Dict]) created users by email, failed (Dict[Str, Str]) errors by ledger number / email
+        """
+        if plan is None:
+            plan = self.plan(departments, users)
+        ledger = dict(plan.ledger)
+        failed = {}
+        created_departments = {}
+        department_key = lambda x: ledger_key(x.get('general_ledger_number')) or x.get('name')
+        user_key = lambda x: email_key(x.get('email'))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            waiting = list(plan.departments)
+            while waiting:
+                ready = [x for x in waiting if ledger_key(x.get('head_general_ledger_number')) in ledger
+                         or x.get('head_general_ledger_number') is None]
+                if not ready:
+                    for x in waiting:
+                        failed[department_key(x)] = "Missing or failed head department {}".format(x.get('head_general_ledger_number'))
+                    break
+                started = set(id(x) for x in ready)
+                waiting = [x for x in waiting if id(x) not in started]
+                created = self._run(executor, ready, self._create_department, ledger, failed, department_key)
+                created_departments.update(created)
+                # keyed by the requested ledger number, the response doesn't always echo it
+                for department in ready:
+                    key = ledger_key(department.get('general_ledger_number'))
+                    if key is not None and created.get(key) is not None:
+                        ledger[key] = created[key]
+
+            ready = []
+            for user in plan.users:
+                key = ledger_key(user.get('general_ledger_number'))
+                if key is not None and key not in ledger:
+                    failed[user_key(user)] = "Missing or failed department {}".format(key)
+                else:
+                    ready.append(user)
+            created_users = self._run(executor, ready, self._create_user, ledger, failed, user_key)
+
+        self.connection.logger.info("Provisioned {} departments and {} users, {} failed".format(
+            len(created_departments), len(created_users), len(failed)))
+        return {
+            'departments': created_departments,
+            'users': created_users,
+            'failed': failed,
+        }
@@ -0,0 +1,218 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# kinds of nodes, and whether they are measurements (True) or indices (False)
+NODE_KINDS = {
+    'course': False,
+    'company': False,
+    'measurement': True,
+    'combination': False,
+    'combination_index': False,
+}
+
+
+class TreeNode(object):
+    """A node in the desired Nightingale index / measurement tree
+
+    Args:
+        object (object): Extends the Class Object
+
+    Instance Variables
+        code:           index_code / measurement_code of the node
+        kind:           'course' (top level index), 'company' (index under an index), 'measurement' (measurement under an index),
+                        'combination' (index combining measurements) or 'combination_index' (index combining indices)
+        name:           name of the node
+        description:    description of the node
+        children:       nodes directly under this node, their parent_id is the id of this node
+        members:        codes of the measurements / indices a combination node combines
+        connections:    codes of other indices a measurement is also connected to
+        assigned:       assigned count of a measurement
+        finished:       finished count of a measurement
+    """
+    def __init__(self, code, kind, name, description='', children=None, members=None, connections=None,
+                 assigned=None, finished=None):
+        if kind not in NODE_KINDS:
+            raise ValueError("Unknown node kind {}".format(kind))
+        self.code = code
+        self.kind = kind
+        self.name = name
+        self.description = description
+        self.children = children or []
+        self.members = members or []
+        self.connections = connections or []
+        self.assigned = assigned
+        self.finished = finished
+        self.parent_code = None
+
+    def dependencies(self):
+        """Returns the codes of the nodes that have to exist before this one can be created"""
+        if self.kind in ('combination', 'combination_index'):
+            return list(self.members)
+        if self.parent_code is not None:
+            return [self.parent_code]
+        return []
+
+
+class IndexTreeBuilder(object):
+    """Creates the missing nodes of a Nightingale index / measurement tree, level by level,
+    with the nodes of each level created concurrently. Nodes that already exist are left alone,
+    so the time it takes grows with the depth of the tree, not the amount of nodes.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, connection, max_workers=8):
+        """Initializes the builder
+
+        Args:
+            connection (NightingaleConnection): connection to Nightingale
+            max_workers (int, optional): Max amount of nodes created at the same time. Defaults to 8.
+        """
+        self.connection = connection
+        self.max_workers = max_workers
+
+    def _flatten(self, roots):
+        """Maps all the nodes of the tree by code, setting the parent code of each node"""
+        nodes = {}
+        stack = [(x, None) for x in roots]
+        while stack:
+            node, parent_code = stack.pop()
+            if node.code in nodes:
+                raise ValueError("Node code {} is used more than once".format(node.code))
+            node.parent_code = parent_code
+            nodes[node.code] = node
+            stack.extend((x, node.code) for x in node.children)
+        return nodes
+
+    def _existing_ids(self):
+        """Maps the codes of the existing indices and measurements to their ids
+
+        Raises:
+            ValueError: if the indices or measurements could not be fetched, building without them would create duplicates
+        """
+        ids = {}
+        indices = self.connection.get_indices()
+        measurements = self.connection.get_measurements()
+        if indices is None or measurements is None:
+            raise ValueError("Could not fetch the existing {}, not building the tree".format(
+                'indices' if indices is None else 'measurements'))
+        for code, x in indices.items():
+            ids[code] = x['id']
+        for code, x in measurements.items():
+            ids[code] = x['id']
+        return ids
+
+    def plan(self, roots, existing=None):
+        """Works out which nodes are missing, and splits them into levels.
+        Every node only depends on nodes that exist or are in an earlier level.
+
+        Args:
+            roots (List[TreeNode]): top nodes of the desired tree
+            existing (Dict[Str, Str], optional): ids of the existing nodes mapped by code. Defaults to fetching them.
+
+        Raises:
+            ValueError: if the dependencies of the nodes form a cycle, or the existing nodes could not be fetched
+
+        Returns:
+            List[List[TreeNode]], Dict[Str, Str]: the levels of missing nodes, and the ids of the existing nodes
+        """
+        nodes = self._flatten(roots)
+        if existing is None:
+            existing = self._existing_ids()
+        levels = {}
+
+        def level(code, visiting):
+            if code in existing or code not in nodes:
+                return -1
+            if code in levels:
+                return levels[code]
+            if code in visiting:
+                raise ValueError("Dependency cycle at node {}".format(code))
+            visiting.add(code)
+            levels[code] = 1 + max([level(x, visiting) for x in nodes[code].dependencies()] + [-1])
+            visiting.discard(code)
+            return levels[code]
+
+        for code in nodes:
+            level(code, set())
+        planned = [[] for _ in range(max(levels.values()) + 1 if levels else 0)]
+        for code, depth in levels.items():
+            planned[depth].append(nodes[code])
+        return planned, existing
+
+    def _create(self, node, ids):
+        """Creates the node, using the ids of its dependencies"""
+        connection = self.connection
+        if node.kind == 'course':
+            return connection.create_course_index({'name': node.name, 'description': node.description}, node.code)
+        if node.kind == 'company':
+            return connection.create_company_index(node.name, node.description, node.code, ids[node.parent_code])
+        if node.kind == 'measurement':
+            return connection.create_measurement(node.name, node.description, node.code, ids[node.parent_code],
+                                                 node.assigned, node.finished)
+        members = [ids[x] for x in node.members]
+        if node.kind == 'combination':
+            return connection.create_combination_index(node.code, members, node.name, node.description)
+        return connection.create_combination_index_index(node.code, members, node.name, node.description)
+
+    def build(self, roots):
+        """Creates the missing nodes of the tree, and the extra connections of new measurements
+
+        Args:
+            roots (List[TreeNode]): top nodes of the desired tree
+
+        Returns:
+            Dict: created (Dict[Str, Str]) ids of the new nodes by code, failed (Dict[Str, Str]) errors by code,
+                  existing (Int) amount of nodes that were already there and levels (Int) amount of levels created
+        """
+        levels, existing = self.plan(roots)
+        ids = dict(existing)
+        created = {}
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for nodes in levels:
+                futures = {}
+                for node in nodes:
+                    missing = [x for x in node.dependencies() if x not in ids]
+                    if missing:
+                        failed[node.code] = "Missing or failed dependencies {}".format(missing)
+                        continue
+                    futures[node.code] = executor.submit(self._create, node, ids)
+                for code, future in futures.items():
+                    try:
+                        new_id = future.result()
+                    except Exception as e:
+                        failed[code] = str(e)
+                        continue
+                    if new_id is None:
+                        failed[code] = "Creating node failed"
+                    else:
+                        ids[code] = new_id
+                        created[code] = new_id
+
+            # extra connections are independent of each other, so they are all created at once
+            connections = []
+            for nodes in levels:
+                for node in nodes:
+                    if node.kind == 'measurement' and node.code in created:
+                        for index_code in node.connections:
+                            if index_code in ids:
+                                future = executor.submit(self.connection.create_measurement_index_connection,
+                                                         ids[node.code], ids[index_code])
+                                connections.append(('{}->{}'.format(node.code, index_code), future))
+                            else:
+                                failed['{}->{}'.format(node.code, index_code)] = "Missing index {}".format(index_code)
+            for name, future in connections:
+                try:
+                    connection_id = future.result()
+                except Exception as e:
+                    failed[name] = str(e)
+                    continue
+                if connection_id is None:
+                    failed[name] = "Creating connection failed"
+
+        return {
+            'created': created,
+            'failed': failed,
+            'existing': sum(1 for x in self._flatten(roots) if x in existing),
+            'levels': len(levels),
+        }
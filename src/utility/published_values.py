@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+import time
+
+
+class PublishedValueStore(object):
+    """Persistent store of the last measurement value published per measurement, stored in a SQLite file.
+    Used to skip publishing values that haven't changed since the last run.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, path, heartbeat=7 * 24 * 60 * 60):
+        """Initializes the store, creating the SQLite file and table if they don't exist
+
+        Args:
+            path (Str): Path to the SQLite file
+            heartbeat (Int, optional): Seconds after which an unchanged value is published again,
+                                       None never publishes unchanged values. Defaults to 7 days.
+        """
+        self.path = path
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS published_values (
+                                      tenant TEXT NOT NULL,
+                                      measurement_id TEXT NOT NULL,
+                                      assigned REAL NOT NULL,
+                                      finished REAL NOT NULL,
+                                      published_at REAL NOT NULL,
+                                      PRIMARY KEY (tenant, measurement_id))""")
+
+    def get(self, tenant, measurement_id):
+        """Gets the last value published for the measurement
+
+        Args:
+            tenant (Str): the tenant, e.g. the endpoint and username of the connection
+            measurement_id (Str): id of the measurement
+
+        Returns:
+            Tuple[Float, Float, Float]: (assigned, finished, published_at), or None if nothing was published
+        """
+        with self._lock:
+            return self._conn.execute("""SELECT assigned, finished, published_at FROM published_values
+                                         WHERE tenant = ? AND measurement_id = ?""",
+                                      (tenant, str(measurement_id))).fetchone()
+
+    def is_due(self, tenant, measurement_id, assigned, finished, heartbeat=None):
+        """Checks if the value has to be published, that is if it changed since the last one
+        or the last one is older than the heartbeat
+
+        Args:
+            tenant (Str): the tenant
+            measurement_id (Str): id of the measurement
+            assigned (Int): assigned count
+            finished (Int): finished count
+            heartbeat (Int, optional): overrides the heartbeat of the store. Defaults to None.
+
+        Returns:
+            Bool: True if the value should be published
+        """
+        last = self.get(tenant, measurement_id)
+        if last is None or last[0] != assigned or last[1] != finished:
+            return True
+        heartbeat = self.heartbeat if heartbeat is None else heartbeat
+        return heartbeat is not None and time.time() - last[2] >= heartbeat
+
+    def record(self, tenant, measurement_id, assigned, finished):
+        """Stores the value as the last one published for the measurement
+
+        Args:
+            tenant (Str): the tenant
+            measurement_id (Str): id of the measurement
+            assigned (Int): assigned count
+            finished (Int): finished count
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO published_values VALUES (?, ?, ?, ?, ?)",
+                               (tenant, str(measurement_id), assigned, finished, time.time()))
+
+    def forget(self, tenant=None, measurement_id=None):
+        """Removes stored values, so they are published on the next run. All of them if neither tenant
+        nor measurement_id are given
+
+        Args:
+            tenant (Str, optional): only remove values of this tenant. Defaults to None.
+            measurement_id (Str, optional): only remove the value of this measurement. Defaults to None.
+        """
+        query = "DELETE FROM published_values WHERE 1 = 1"
+        params = []
+        if tenant is not None:
+            query += " AND tenant = ?"
+            params.append(tenant)
+        if measurement_id is not None:
+            query += " AND measurement_id = ?"
+            params.append(str(measurement_id))
+        with self._lock, self._conn:
+            self._conn.execute(query, params)
+
+    def close(self):
+        """Closes the SQLite file"""
+        self._conn.close()
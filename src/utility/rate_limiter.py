@@ -0,0 +1,129 @@
+import threading
+import time
+
+
+class RateLimiter(object):
+    """Thread safe token bucket, that paces requests so they stay under the rate limit of an api.
+    The rate adapts to the x-ratelimit-* headers of every response, so a single limiter can be
+    shared between threads and between multiple connection objects using the same credentials.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, rate=10.0, capacity=None, window=60, reserve=10, min_rate=0.5):
+        """Initializes the limiter
+
+        Args:
+            rate (Float, optional): Requests per second allowed before any headers have been seen. Defaults to 10.0.
+            capacity (Float, optional): Max amount of requests that can be sent in a burst. Defaults to one second worth of requests.
+            window (Int, optional): Length of the rate limit window in seconds, used when the response has no reset header. Defaults to 60.
+            reserve (Int, optional): Amount of requests left unused in each window, as a safety margin. Defaults to 10.
+            min_rate (Float, optional): The pacing never goes below this rate while there is budget left. Defaults to 0.5.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self.window = window
+        self.reserve = reserve
+        self.min_rate = min_rate
+        self.limit = None
+        self.remaining = None
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Adds the tokens gained since the last refill, must be called while holding the lock"""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens=1):
+        """Takes tokens from the bucket, sleeping until they are available.
+        Waiting callers are served in the order they arrived.
+
+        Args:
+            tokens (Int, optional): Amount of tokens needed. Defaults to 1.
+
+        Returns:
+            Float: seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._blocked_until - now)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def block(self, seconds):
+        """Stops all requests for the given amount of seconds, e.g. after a 429 response
+
+        Args:
+            seconds (Float): seconds to wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+    def update(self, headers):
+        """Adjusts the rate to the budget that is left, using the x-ratelimit-limit,
+        x-ratelimit-remaining and x-ratelimit-reset headers.
+
+        Args:
+            headers (Dict): headers of the response
+
+        Returns:
+            Int: the remaining rate limit, or None if the headers don't contain it
+        """
+        remaining = _int_header(headers, 'x-ratelimit-remaining')
+        if remaining is None:
+            return None
+        limit = _int_header(headers, 'x-ratelimit-limit')
+        reset = _reset_seconds(headers.get('x-ratelimit-reset'))
+        if reset is None or reset <= 0:
+            reset = self.window
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit is not None:
+                self.limit = limit
+            self.remaining = remaining
+            usable = remaining - self.reserve
+            if usable <= 0:
+                # the budget is spent, wait until the window resets
+                self._blocked_until = max(self._blocked_until, now + reset)
+                self._tokens = min(self._tokens, 0.0)
+            else:
+                # spread what is left evenly over the rest of the window
+                self.rate = max(usable / reset, self.min_rate)
+                self.capacity = max(self.rate, 1.0)
+                self._tokens = min(self._tokens, self.capacity, float(usable))
+        return remaining
+
+
+def _int_header(headers, name):
+    """Reads a header as an integer, returns None if it is missing or not a number"""
+    value = headers.get(name)
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _reset_seconds(value):
+    """Turns the value of a reset header into seconds from now, it can either be
+    the amount of seconds left or a unix timestamp"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value > 1e9:
+        return value - time.time()
+    return value
@@ -0,0 +1,140 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class SnapshotCache(object):
+    """Persistent on-disk cache of api reference data, stored in a SQLite file.
+    Snapshots are keyed by tenant and endpoint, and expire after a time to live.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    def __init__(self, path, ttl=6 * 60 * 60, ttls=None):
+        """Initializes the cache, creating the SQLite file and table if they don't exist
+
+        Args:
+            path (Str): Path to the SQLite file
+            ttl (Int, optional): Default time to live of a snapshot in seconds. Defaults to 6 hours.
+            ttls (Dict[Str, Int], optional): Time to live per endpoint, overrides the default. Defaults to None.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+                                      tenant TEXT NOT NULL,
+                                      endpoint TEXT NOT NULL,
+                                      data TEXT NOT NULL,
+                                      created_at REAL NOT NULL,
+                                      expires_at REAL NOT NULL,
+                                      PRIMARY KEY (tenant, endpoint))""")
+
+    def get(self, tenant, endpoint):
+        """Gets the snapshot, if it exists and hasn't expired
+
+        Args:
+            tenant (Str): the tenant, e.g. the client id of the connection
+            endpoint (Str): name of the endpoint, e.g. 'users'
+
+        Returns:
+            Any: the cached data, or None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT data, expires_at FROM snapshots WHERE tenant = ? AND endpoint = ?",
+                                     (tenant, endpoint)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, tenant, endpoint, data, ttl=None):
+        """Stores the snapshot
+
+        Args:
+            tenant (Str): the tenant
+            endpoint (Str): name of the endpoint
+            data (Any): json serializable data
+            ttl (Int, optional): time to live in seconds. Defaults to the ttl of the endpoint.
+        """
+        if ttl is None:
+            ttl = self.ttls.get(endpoint, self.ttl)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                               (tenant, endpoint, json.dumps(data), now, now + ttl))
+
+    def invalidate(self, tenant=None, endpoint=None):
+        """Removes snapshots, all of them if neither tenant nor endpoint are given
+
+        Args:
+            tenant (Str, optional): only remove snapshots of this tenant. Defaults to None.
+            endpoint (Str, optional): only remove snapshots of this endpoint. Defaults to None.
+        """
+        query = "DELETE FROM snapshots WHERE 1 = 1"
+        params = []
+        if tenant is not None:
+            query += " AND tenant = ?"
+            params.append(tenant)
+        if endpoint is not None:
+            query += " AND endpoint = ?"
+            params.append(endpoint)
+        with self._lock, self._conn:
+            self._conn.execute(query, params)
+
+    def _modify(self, tenant, endpoint, func):
+        """Applies func to a live snapshot and stores the result, keeping its expiry time"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT data, expires_at FROM snapshots WHERE tenant = ? AND endpoint = ?",
+                                     (tenant, endpoint)).fetchone()
+            if row is None or row[1] < time.time():
+                return
+            data = func(json.loads(row[0]))
+            self._conn.execute("UPDATE snapshots SET data = ? WHERE tenant = ? AND endpoint = ?",
+                               (json.dumps(data), tenant, endpoint))
+
+    def upsert_record(self, tenant, endpoint, record, key='id'):
+        """Adds or replaces a record in a cached snapshot, so writes don't make the snapshot stale.
+        Works on snapshots that are lists of records, or dicts of records mapped by the key.
+
+        Args:
+            tenant (Str): the tenant
+            endpoint (Str): name of the endpoint
+            record (Dict): the new record
+            key (Str, optional): field that identifies the record. Defaults to 'id'.
+        """
+        if not isinstance(record, dict) or record.get(key) is None:
+            return
+
+        def upsert(data):
+            if isinstance(data, dict):
+                data[str(record[key])] = record
+                return data
+            for i, x in enumerate(data):
+                if str(x.get(key)) == str(record[key]):
+                    data[i] = dict(x, **record)
+                    return data
+            data.append(record)
+            return data
+        self._modify(tenant, endpoint, upsert)
+
+    def remove_record(self, tenant, endpoint, value, key='id'):
+        """Removes a record from a cached snapshot
+
+        Args:
+            tenant (Str): the tenant
+            endpoint (Str): name of the endpoint
+            value (Any): value of the key of the record
+            key (Str, optional): field that identifies the record. Defaults to 'id'.
+        """
+        def remove(data):
+            if isinstance(data, dict):
+                return { k: v for k, v in data.items() if str(v.get(key)) != str(value) }
+            return [x for x in data if str(x.get(key)) != str(value)]
+        self._modify(tenant, endpoint, remove)
+
+    def close(self):
+        """Closes the SQLite file"""
+        self._conn.close()
@@ -1,5 +1,16 @@
+import decimal
+import itertools
 import pyodbc
-from typing import List, Any, Dict
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import List, Any, Dict, Iterable, Union
+from utility.columnar import fetch_columns
+from utility.sql_pool import SQLConnectionPool
+from utility.sql_watermark import ChangeSet, WatermarkStore
+from utility.sql_statements import (exists_key_statement, insert_statement, lookup_statement,
+                                    quote_identifier, select_statement, update_statement)
 
 
 class SQLServerConnection(object):
@@ -10,21 +21,72 @@ class SQLServerConnection(object):
         database (str, optional): The name of the Database. Defaults to None.
     """
 
-    def __init__(self, server: str = None,  driver: str = None, database: str = None):
+    def __init__(self, server: str = None,  driver: str = None, database: str = None, pool_size: int = None,
+                 pool_timeout: float = None, recycle: int = 3600):
         """Initializes connection to a database
 
         Args:
             server (str, optional): The server ip or path to the server. Defaults to None.
             driver (str, optional): The driver the opperating system can use to connect to the sql. Defaults to None.
             database (str, optional): The name of the Database. Defaults to None.
+            pool_size (int, optional): If set, the connection uses a thread safe pool of this many connections
+                                       instead of a single connection, so it can be shared by threads. Defaults to None.
+            pool_timeout (float, optional): Max seconds to wait for a free pooled connection. Defaults to None, waiting forever.
+            recycle (int, optional): Pooled connections older than this many seconds are replaced. Defaults to 3600.
         """
         connection_string = ('DRIVER={};'
                              'SERVER={};'
                              'DATABASE={};'
                              'Trusted_Connection=yes;').format(driver, server, database)
 
-        conn = pyodbc.connect(connection_string, autocommit = True)
-        self.cursor = conn.cursor()
+        self.pool = None
+        self.connection = None
+        self.cursor = None
+        if pool_size is not None:
+            self.pool = SQLConnectionPool(connection_string, size=pool_size, autocommit=True,
+                                          recycle=recycle, timeout=pool_timeout)
+        else:
+            conn = pyodbc.connect(connection_string, autocommit = True)
+            self.connection = conn
+            self.cursor = conn.cursor()
+
+    @contextmanager
+    def _connection(self):
+        """Gives the connection the statement should run on, a pooled connection is checked out for the with block
+
+        Yields:
+            pyodbc.Connection: the connection
+        """
+        if self.pool is None:
+            yield self.connection
+        else:
+            with self.pool.connection() as conn:
+                yield conn
+
+    @contextmanager
+    def _cursor(self):
+        """Gives the cursor the statement should run on. Without a pool it is the shared cursor,
+        with a pool it is a new cursor on a connection checked out for the with block
+
+        Yields:
+            pyodbc.Cursor: the cursor
+        """
+        if self.pool is None:
+            yield self.cursor
+            return
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Closes the connection, or all the idle connections of the pool"""
+        if self.pool is not None:
+            self.pool.close()
+        else:
+            self.connection.close()
 
     def update(self, table: str, update_columns: List[str],
                condition_columns: List[str], values: List[Any]):
@@ -36,14 +98,10 @@ class SQLServerConnection(object):
             condition_columns (List[str]): List of conditions
             values (List[Any]): List of the new values
         """
-        update_columns_query = ' = ?, '.join(update_columns)
-
-        condition_columns_query = ' = ? and '.join(condition_columns)
+        statement = update_statement(table, tuple(update_columns), tuple(condition_columns))
 
-        self.cursor.execute("""UPDATE {} 
-                               SET {} = ? 
-                               WHERE {} = ?""".format(
-            table, update_columns_query, condition_columns_query), values)
+        with self._cursor() as cursor:
+            cursor.execute(statement, values)
         
     def insert(self, table: str, columns: List[str], values: List):
         """Executes Insert statement in the connected database
@@ -53,11 +111,139 @@ class SQLServerConnection(object):
             columns (List[str]): List of names of the columns that are being inserted into
             values (List): List of the values
         """
-        table = '[{}]'.format(table)
-        header = ', '.join(['[{}]'.format(x) for x in columns])
+        statement = insert_statement(table, tuple(columns))
+
+        with self._cursor() as cursor:
+            cursor.execute(statement, values)
+
+    def insert_many(self, table: str, columns: List[str], rows: Iterable[Union[tuple, Dict[str, Any]]],
+                    batch_size: int = 1000):
+        """Inserts the rows in batches using pyodbc's fast_executemany, with one transaction per batch.
+        The statement is built once for all the batches.
+
+        Args:
+            table (str): Name of the table being inserted into
+            columns (List[str]): List of names of the columns that are being inserted into
+            rows (Iterable[Union[tuple, Dict[str, Any]]]): The rows, either tuples in the same order as the columns or dicts keyed by column
+            batch_size (int, optional): Amount of rows sent per batch. Defaults to 1000.
+
+        Returns:
+            Dict[str, Any]: rows (int) inserted, batches (int) sent, seconds (float) in total and batch_seconds (List[float]) per batch
+        """
+        statement = insert_statement(table, tuple(columns))
+
+        inserted = 0
+        batch_seconds = []
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            autocommit = conn.autocommit
+            conn.autocommit = False
+            try:
+                for batch in _batches(rows, columns, batch_size):
+                    start = time.perf_counter()
+                    try:
+                        cursor.executemany(statement, batch)
+                        conn.commit()
+                    except pyodbc.Error:
+                        conn.rollback()
+                        raise
+                    batch_seconds.append(time.perf_counter() - start)
+                    inserted += len(batch)
+            finally:
+                conn.autocommit = autocommit
+                cursor.close()
+
+        return {
+            'rows': inserted,
+            'batches': len(batch_seconds),
+            'seconds': sum(batch_seconds),
+            'batch_seconds': batch_seconds,
+        }
+
+    def upsert_many(self, table: str, key_columns: List[str], rows: Iterable[Union[tuple, Dict[str, Any]]],
+                    columns: List[str] = None, batch_size: int = 1000):
+        """Inserts or updates the rows with a single MERGE statement. The rows are first bulk loaded
+        into a temporary staging table, and rows that are identical to the ones in the table are left alone.
+        Everything runs in one transaction on one connection.
+
+        Args:
+            table (str): Name of the table being upserted into
+            key_columns (List[str]): Columns that identify a row, the rows must be unique on these columns
+            rows (Iterable[Union[tuple, Dict[str, Any]]]): The rows, either tuples in the same order as the columns or dicts keyed by column
+            columns (List[str], optional): All the columns of the rows, including the keys. Defaults to the keys of the first row, which then has to be a dict.
+            batch_size (int, optional): Amount of rows sent per batch to the staging table. Defaults to 1000.
+
+        Returns:
+            Dict[str, Any]: rows (int) staged, inserted (int), updated (int), unchanged (int) and seconds (float)
+        """
+        rows = iter(rows)
+        if columns is None:
+            first = next(rows, None)
+            if first is None:
+                return {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'seconds': 0.0}
+            columns = list(first.keys())
+            rows = itertools.chain([first], rows)
+        value_columns = [x for x in columns if x not in key_columns]
+
+        target = quote_identifier(table)
+        stage = quote_identifier('#upsert_{}'.format(uuid.uuid4().hex[:12]))
+        header = ', '.join([quote_identifier(x) for x in columns])
         parameters = ', '.join(['?']*len(columns))
-        
-        self.cursor.execute('INSERT INTO {} ({}) VALUES({})'.format(table, header, parameters), values)
+        condition = ' AND '.join(['t.{0} = s.{0}'.format(quote_identifier(x)) for x in key_columns])
+        merge = ['SET NOCOUNT ON;',
+                 'DECLARE @actions TABLE (action nvarchar(10));',
+                 'MERGE {} WITH (HOLDLOCK) AS t USING {} AS s ON {}'.format(target, stage, condition)]
+        if value_columns:
+            merge.append('WHEN MATCHED AND EXISTS (SELECT {} EXCEPT SELECT {}) THEN UPDATE SET {}'.format(
+                ', '.join(['s.{}'.format(quote_identifier(x)) for x in value_columns]),
+                ', '.join(['t.{}'.format(quote_identifier(x)) for x in value_columns]),
+                ', '.join(['t.{0} = s.{0}'.format(quote_identifier(x)) for x in value_columns])))
+        merge.append('WHEN NOT MATCHED BY TARGET THEN INSERT ({}) VALUES ({})'.format(
+            header, ', '.join(['s.{}'.format(quote_identifier(x)) for x in columns])))
+        merge.append('OUTPUT $action INTO @actions;')
+        merge.append("""SELECT COALESCE(SUM(CASE WHEN action = 'INSERT' THEN 1 ELSE 0 END), 0),
+                               COALESCE(SUM(CASE WHEN action = 'UPDATE' THEN 1 ELSE 0 END), 0)
+                        FROM @actions;""")
+
+        start = time.perf_counter()
+        staged = 0
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            autocommit = conn.autocommit
+            conn.autocommit = False
+            committed = False
+            try:
+                # the staging table gets the same column types as the target table
+                cursor.execute('SELECT TOP 0 {} INTO {} FROM {}'.format(header, stage, target))
+                statement = 'INSERT INTO {} ({}) VALUES({})'.format(stage, header, parameters)
+                for batch in _batches(rows, columns, batch_size):
+                    cursor.executemany(statement, batch)
+                    staged += len(batch)
+                cursor.execute('\n'.join(merge))
+                inserted, updated = cursor.fetchone()
+                cursor.execute('DROP TABLE {}'.format(stage))
+                conn.commit()
+                committed = True
+            finally:
+                # roll back on any error, turning autocommit back on would commit the open transaction
+                # and leave the staging table on the connection
+                if not committed:
+                    try:
+                        conn.rollback()
+                    except pyodbc.Error:
+                        pass
+                conn.autocommit = autocommit
+                cursor.close()
+
+        return {
+            'rows': staged,
+            'inserted': inserted,
+            'updated': updated,
+            'unchanged': staged - inserted - updated,
+            'seconds': time.perf_counter() - start,
+        }
 
     def select(self, table: str, columns: List[str] = None):
         """Executes Select statement in the connected database
@@ -69,17 +255,183 @@ class SQLServerConnection(object):
         Returns:        
              List[Dict[str, Any]]: Returns a list of the rows returned from the database
         """
-        table = '[{}]'.format(table)
-        header = '*'
-        if columns is not None:
-            header = ', '.join(['[{}]'.format(x) for x in columns])
+        statement = select_statement(table, tuple(columns) if columns is not None else None)
 
-        self.cursor.execute('select {} from {}'.format(header, table))
-        result = self.cursor.fetchall()
-        columns = [column[0] for column in self.cursor.description]
+        with self._cursor() as cursor:
+            cursor.execute(statement)
+            result = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
 
         return [dict(zip(columns, x)) for x in result]
 
+    def select_iter(self, table: str, columns: List[str] = None, row_format: str = 'dict', arraysize: int = 1000):
+        """Executes Select statement in the connected database, and streams the rows
+        with fetchmany instead of loading them all into memory
+
+        Args:
+            table (str): Name of the table being selected
+            columns (List[str], optional): List of the columns being selected. Defaults to None.
+            row_format (str, optional): Shape of the rows, 'tuple', 'namedtuple' or 'dict'. Defaults to 'dict'.
+            arraysize (int, optional): Amount of rows fetched from the database at a time. Defaults to 1000.
+
+        Yields:
+            Union[tuple, Dict[str, Any]]: the rows, in the chosen format
+        """
+        statement = select_statement(table, tuple(columns) if columns is not None else None)
+
+        return self._iter_query(statement, row_format, arraysize)
+
+    def custom_query_iter(self, query: str, row_format: str = 'dict', arraysize: int = 1000):
+        """Executes a custom query, and streams the rows with fetchmany
+
+        Args:
+            query (str): custom query
+            row_format (str, optional): Shape of the rows, 'tuple', 'namedtuple' or 'dict'. Defaults to 'dict'.
+            arraysize (int, optional): Amount of rows fetched from the database at a time. Defaults to 1000.
+
+        Yields:
+            Union[tuple, Dict[str, Any]]: the rows, in the chosen format
+        """
+        return self._iter_query(query, row_format, arraysize)
+
+    def _iter_query(self, query: str, row_format: str, arraysize: int, params: List[Any] = None):
+        """Runs the query on its own cursor and yields the rows batch by batch
+
+        Args:
+            query (str): the query
+            row_format (str): Shape of the rows, 'tuple', 'namedtuple' or 'dict'
+            arraysize (int): Amount of rows fetched from the database at a time
+            params (List[Any], optional): Parameters of the query. Defaults to None.
+
+        Yields:
+            Union[tuple, Dict[str, Any]]: the rows, in the chosen format
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = arraysize
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                # the column list is only built once, and shared by all the rows
+                make_row = _row_factory([column[0] for column in cursor.description], row_format)
+                while True:
+                    rows = cursor.fetchmany(arraysize)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield make_row(row)
+            finally:
+                cursor.close()
+
+    def select_columnar(self, table: str, columns: List[str] = None, arraysize: int = 10000):
+        """Executes Select statement in the connected database, and returns the result as one array per column.
+        Numeric columns are numpy arrays if numpy is installed, so aggregates can be vectorized.
+
+        Args:
+            table (str): Name of the table being selected
+            columns (List[str], optional): List of the columns being selected. Defaults to None.
+            arraysize (int, optional): Amount of rows fetched from the database at a time. Defaults to 10000.
+
+        Returns:
+            Dict[str, Any]: numpy arrays / lists mapped by column name
+        """
+        statement = select_statement(table, tuple(columns) if columns is not None else None)
+        return self.custom_query_columnar(statement, arraysize)
+
+    def custom_query_columnar(self, query: str, arraysize: int = 10000):
+        """Executes a custom query, and returns the result as one array per column
+
+        Args:
+            query (str): custom query
+            arraysize (int, optional): Amount of rows fetched from the database at a time. Defaults to 10000.
+
+        Returns:
+            Dict[str, Any]: numpy arrays / lists mapped by column name
+        """
+        with self._cursor() as cursor:
+            cursor.execute(query)
+            return fetch_columns(cursor, arraysize)
+
+    def select_changes(self, table: str, watermark_column: str, store: WatermarkStore, columns: List[str] = None,
+                       name: str = None, rowversion: bool = False):
+        """Selects only the rows changed since the last committed watermark of the table,
+        using a rowversion or last modified column. Call commit on the result once the rows
+        have been processed, otherwise the next read returns the same rows again.
+
+        Args:
+            table (str): Name of the table being selected
+            watermark_column (str): rowversion or last modified column
+            store (WatermarkStore): store the watermarks are kept in
+            columns (List[str], optional): List of the columns being selected, the watermark column is always included. Defaults to None.
+            name (str, optional): Name of the watermark. Defaults to table.watermark_column.
+            rowversion (bool, optional): Set to True for rowversion columns, rows of transactions that are still open are then
+                                         left for the next read so none are skipped. Defaults to False.
+
+        Returns:
+            ChangeSet: the changed rows, as dicts, and the new watermark
+        """
+        if columns is not None and watermark_column not in columns:
+            columns = list(columns) + [watermark_column]
+        statement = select_statement(table, tuple(columns) if columns is not None else None)
+        name = name if name is not None else '{}.{}'.format(table, watermark_column)
+        return self._read_changes(statement, watermark_column, store, name, rowversion)
+
+    def query_changes(self, query: str, watermark_column: str, store: WatermarkStore, name: str,
+                      rowversion: bool = False):
+        """Runs a source query, returning only the rows changed since its last committed watermark.
+        The query can't have an ORDER BY clause, since it is used as a subquery.
+
+        Args:
+            query (str): source query, must return the watermark column
+            watermark_column (str): rowversion or last modified column
+            store (WatermarkStore): store the watermarks are kept in
+            name (str): Name of the watermark
+            rowversion (bool, optional): Set to True for rowversion columns. Defaults to False.
+
+        Returns:
+            ChangeSet: the changed rows, as dicts, and the new watermark
+        """
+        return self._read_changes(query, watermark_column, store, name, rowversion)
+
+    def _read_changes(self, source: str, watermark_column: str, store: WatermarkStore, name: str, rowversion: bool):
+        """Reads the rows of the source query that are above the stored watermark, ordered by the watermark
+
+        Args:
+            source (str): the source query
+            watermark_column (str): rowversion or last modified column
+            store (WatermarkStore): store the watermarks are kept in
+            name (str): Name of the watermark
+            rowversion (bool): True for rowversion columns
+
+        Returns:
+            ChangeSet: the changed rows, as dicts, and the new watermark
+        """
+        previous = store.get(name)
+        column = 'src.{}'.format(quote_identifier(watermark_column))
+        conditions = []
+        params = []
+        if previous is not None:
+            conditions.append('{} > ?'.format(column))
+            params.append(previous)
+        if rowversion:
+            conditions.append('{} < MIN_ACTIVE_ROWVERSION()'.format(column))
+        where = ' WHERE {}'.format(' AND '.join(conditions)) if conditions else ''
+        statement = 'SELECT * FROM ({}) AS src{} ORDER BY {}'.format(source, where, column)
+
+        with self._cursor() as cursor:
+            if params:
+                cursor.execute(statement, params)
+            else:
+                cursor.execute(statement)
+            result = cursor.fetchall()
+            names = [x[0] for x in cursor.description]
+
+        rows = [dict(zip(names, x)) for x in result]
+        watermark = rows[-1][watermark_column] if rows else previous
+        return ChangeSet(store, name, rows, previous, watermark)
+
     def exists(self, query: str):
         """Checks if the query returns data
 
@@ -89,9 +441,81 @@ class SQLServerConnection(object):
         Returns:
             bool: returns True the query returns data 
         """
-        self.cursor.execute(query)
-        data = self.cursor.fetchall()
+        with self._cursor() as cursor:
+            cursor.execute(query)
+            # one row is enough to know, the rest is never fetched
+            data = cursor.fetchone()
         return data is not None
+
+    def exists_key(self, table: str, key_columns: List[str], values: List[Any]):
+        """Checks if a row with the key exists, reading at most one row
+
+        Args:
+            table (str): Name of the table
+            key_columns (List[str]): Columns of the key
+            values (List[Any]): Values of the key columns, in the same order
+
+        Returns:
+            bool: returns True if the row exists
+        """
+        statement = exists_key_statement(table, tuple(key_columns))
+        with self._cursor() as cursor:
+            cursor.execute(statement, list(values))
+            return cursor.fetchone() is not None
+
+    def lookup_many(self, table: str, key_columns: Union[str, List[str]], keys: Iterable[Any],
+                    columns: List[str] = None, chunk_size: int = 1000, normalize: bool = False):
+        """Fetches the rows of many keys in a few chunked, parameterized queries
+
+        Args:
+            table (str): Name of the table
+            key_columns (Union[str, List[str]]): The key column, or the columns of a composite key
+            keys (Iterable[Any]): The keys, single values for a single key column, tuples for a composite key
+            columns (List[str], optional): Columns being selected, the key columns are always included. Defaults to None, all columns.
+            chunk_size (int, optional): Max amount of keys per query, lowered to stay under the parameter limit of SQL Server. Defaults to 1000.
+            normalize (bool, optional): If True keys are also matched ignoring case and the difference between numbers
+                                        and their text, for case insensitive collations or keys passed as the wrong type. Defaults to False.
+
+        Returns:
+            Dict[Any, Dict[str, Any]]: the rows mapped by the keys as they were passed in, keys that don't exist are not in the dict.
+                                       A row is matched to the key that equals it exactly. Otherwise it is matched ignoring
+                                       trailing spaces (padded CHAR), and normalize, but only if that points to exactly one key
+        """
+        single = isinstance(key_columns, str)
+        if single:
+            key_columns = [key_columns]
+        if columns is not None:
+            columns = tuple(key_columns + [x for x in columns if x not in key_columns])
+        # SQL Server allows 2100 parameters per statement
+        chunk_size = max(1, min(chunk_size, 2000 // len(key_columns)))
+
+        keys = list(dict.fromkeys(keys))
+        # the database can return its own version of the key, e.g. padded CHAR, those are matched loosely
+        loose_keys = {}
+        for key in keys:
+            loose_keys.setdefault(_loose_key(key, normalize), []).append(key)
+        result = {}
+        loose_matches = {}
+        with self._cursor() as cursor:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+                params = chunk if single else [value for key in chunk for value in key]
+                cursor.execute(lookup_statement(table, tuple(key_columns), columns, len(chunk)), params)
+                names = [column[0] for column in cursor.description]
+                positions = [names.index(x) for x in key_columns]
+                for row in cursor.fetchall():
+                    key = row[positions[0]] if single else tuple(row[x] for x in positions)
+                    record = dict(zip(names, row))
+                    candidates = loose_keys.get(_loose_key(key, normalize), [])
+                    if key in candidates:
+                        result[key] = record
+                    elif len(candidates) == 1:
+                        loose_matches.setdefault(candidates[0], []).append(record)
+        # a loose match never replaces an exact one, and is dropped if several rows match the same key
+        for key, records in loose_matches.items():
+            if key not in result and len(records) == 1:
+                result[key] = records[0]
+        return result
         
     def truncate(self, table: str):
         """Truncates the table
@@ -99,7 +523,8 @@ class SQLServerConnection(object):
         Args:
             table (str): Name of the tables
         """
-        self.cursor.execute('truncate table {}'.format(table))
+        with self._cursor() as cursor:
+            cursor.execute('truncate table {}'.format(table))
     
     def custom_query(self, query:str):
         """Executes a custom query
@@ -107,9 +532,10 @@ class SQLServerConnection(object):
         Args:
             query (str): custom query
         """ 
-        self.cursor.execute(query)
-        result = self.cursor.fetchall()
-        columns = [column[0] for column in self.cursor.description]
+        with self._cursor() as cursor:
+            cursor.execute(query)
+            result = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
 
         return [dict(zip(columns, x)) for x in result]
     
@@ -121,4 +547,71 @@ class SQLServerConnection(object):
         Args:
             query (str): custom query
         """
-        self.cursor.execute(query)
\ No newline at end of file
+        with self._cursor() as cursor:
+            cursor.execute(query)
+
+
+def _loose_key(key: Any, normalize: bool):
+    """Makes the key lookup_many falls back on when a returned key doesn't equal a requested one.
+    Trailing spaces are always ignored, case and number formatting only if normalize is True"""
+    if isinstance(key, tuple):
+        return tuple(_loose_key(x, normalize) for x in key)
+    if isinstance(key, str):
+        key = key.rstrip()
+        if not normalize:
+            return key
+        key = key.casefold()
+        try:
+            number = decimal.Decimal(key)
+        except decimal.InvalidOperation:
+            return key
+        return '{:f}'.format(number.normalize()) if number.is_finite() else key
+    if normalize and isinstance(key, (int, float, decimal.Decimal)) and not isinstance(key, bool):
+        return '{:f}'.format(decimal.Decimal(str(key)).normalize())
+    return key
+
+
+def _row_factory(columns: List[str], row_format: str):
+    """Creates the function that turns a pyodbc row into the chosen format
+
+    Args:
+        columns (List[str]): names of the columns
+        row_format (str): 'tuple', 'namedtuple' or 'dict'
+
+    Raises:
+        ValueError: if the format is not known
+
+    Returns:
+        Callable: function taking a row and returning it in the chosen format
+    """
+    if row_format == 'tuple':
+        return tuple
+    if row_format == 'namedtuple':
+        row_type = namedtuple('Row', columns, rename=True)
+        return row_type._make
+    if row_format == 'dict':
+        return lambda row: dict(zip(columns, row))
+    raise ValueError("Unknown row format {}, use 'tuple', 'namedtuple' or 'dict'".format(row_format))
+
+
+def _batches(rows: Iterable[Union[tuple, Dict[str, Any]]], columns: List[str], batch_size: int):
+    """Splits the rows into lists of tuples, dict rows are ordered by the columns
+
+    Args:
+        rows (Iterable[Union[tuple, Dict[str, Any]]]): The rows
+        columns (List[str]): The column order
+        batch_size (int): Max amount of rows in a batch
+
+    Yields:
+        List[tuple]: a batch of rows
+    """
+    batch = []
+    for row in rows:
+        if isinstance(row, dict):
+            row = tuple(row[x] for x in columns)
+        batch.append(tuple(row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
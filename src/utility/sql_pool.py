@@ -0,0 +1,150 @@
+import pyodbc
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SQLConnectionPool(object):
+    """Thread safe pool with a fixed number of pyodbc connections.
+    Connections are health checked before they are handed out, and dead or old ones are replaced.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+
+    def __init__(self, connection_string: str, size: int = 5, autocommit: bool = True,
+                 recycle: int = 3600, health_check_interval: int = 30, timeout: float = None):
+        """Initializes the pool, connections are opened when they are first needed
+
+        Args:
+            connection_string (str): pyodbc connection string
+            size (int, optional): Max amount of open connections. Defaults to 5.
+            autocommit (bool, optional): Autocommit mode of the connections. Defaults to True.
+            recycle (int, optional): Connections older than this many seconds are replaced. Defaults to 3600.
+            health_check_interval (int, optional): Connections idle longer than this many seconds are pinged before use. Defaults to 30.
+            timeout (float, optional): Max seconds to wait for a free connection, None waits forever. Defaults to None.
+        """
+        self.connection_string = connection_string
+        self.size = size
+        self.autocommit = autocommit
+        self.recycle = recycle
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        # idle connections as (connection, created_at, last_used), most recently used first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._created = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Opens a new connection"""
+        conn = pyodbc.connect(self.connection_string, autocommit=self.autocommit)
+        with self._lock:
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        """Closes the connection, ignoring errors from connections that are already dead"""
+        with self._lock:
+            self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    def _is_alive(self, conn):
+        """Pings the connection"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def acquire(self, timeout: float = None):
+        """Checks out a connection, waiting for one to be free if all are in use
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Defaults to the timeout of the pool.
+
+        Raises:
+            TimeoutError: if no connection got free in time
+
+        Returns:
+            pyodbc.Connection: the connection, must be given back with release
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No free sql connection after {} seconds".format(timeout))
+        try:
+            now = time.monotonic()
+            while True:
+                try:
+                    conn, created_at, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if now - created_at > self.recycle:
+                    self._discard(conn)
+                    continue
+                if now - last_used > self.health_check_interval and not self._is_alive(conn):
+                    self._discard(conn)
+                    continue
+                return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, check: bool = False):
+        """Gives a connection back to the pool
+
+        Args:
+            conn (pyodbc.Connection): the connection from acquire
+            check (bool, optional): If True the connection is pinged and discarded if it is dead,
+                                    used after a statement failed. Defaults to False.
+        """
+        try:
+            if check and not self._is_alive(conn):
+                self._discard(conn)
+                return
+            try:
+                # drop whatever the borrower left uncommitted
+                if not conn.autocommit:
+                    conn.rollback()
+                conn.autocommit = self.autocommit
+            except pyodbc.Error:
+                self._discard(conn)
+                return
+            with self._lock:
+                created_at = self._created.get(id(conn), time.monotonic())
+            self._idle.put((conn, created_at, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection for the duration of the with block
+
+        Yields:
+            pyodbc.Connection: the connection
+        """
+        conn = self.acquire()
+        failed = False
+        try:
+            yield conn
+        except pyodbc.Error:
+            failed = True
+            raise
+        finally:
+            self.release(conn, check=failed)
+
+    def close(self):
+        """Closes all the idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()[0]
+            except queue.Empty:
+                return
+            self._discard(conn)
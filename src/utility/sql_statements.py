@@ -0,0 +1,159 @@
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# max amount of statement shapes kept per kind of statement
+STATEMENT_CACHE_SIZE = 256
+
+# a name that is used as written, e.g. dbo.table or [my table]
+_RAW_NAME = re.compile(r'^(\[[^\[\]]+\]|\w+)(\.(\[[^\[\]]+\]|\w+))*$')
+_CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f]')
+
+
+def quote_identifier(name: str):
+    """Validates the name of a table or column and puts it in brackets
+
+    Args:
+        name (str): the name
+
+    Raises:
+        ValueError: if the name is empty, too long or contains characters that would break out of the brackets
+
+    Returns:
+        str: the bracketed name
+    """
+    if not isinstance(name, str) or not name or len(name) > 128 \
+            or ']' in name or _CONTROL_CHARACTERS.search(name):
+        raise ValueError("Invalid sql identifier: {!r}".format(name))
+    return '[{}]'.format(name)
+
+
+def validate_raw_name(name: str):
+    """Validates a name that is put into a statement as written, without brackets
+
+    Args:
+        name (str): the name, e.g. table, dbo.table or [my table]
+
+    Raises:
+        ValueError: if the name isn't a plain or bracketed, optionally dotted, identifier
+
+    Returns:
+        str: the name
+    """
+    if not isinstance(name, str) or not _RAW_NAME.match(name):
+        raise ValueError("Invalid sql identifier: {!r}".format(name))
+    return name
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def insert_statement(table: str, columns: Tuple[str, ...]):
+    """Builds the INSERT statement used by SQLServerConnection.insert and insert_many
+
+    Args:
+        table (str): Name of the table
+        columns (Tuple[str, ...]): Names of the columns
+
+    Returns:
+        str: INSERT INTO [table] ([a], [b]) VALUES(?, ?)
+    """
+    header = ', '.join([quote_identifier(x) for x in columns])
+    parameters = ', '.join(['?']*len(columns))
+    return 'INSERT INTO {} ({}) VALUES({})'.format(quote_identifier(table), header, parameters)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def update_statement(table: str, update_columns: Tuple[str, ...], condition_columns: Tuple[str, ...]):
+    """Builds the UPDATE statement used by SQLServerConnection.update, the names are used as written
+
+    Args:
+        table (str): Name of the table
+        update_columns (Tuple[str, ...]): Names of the columns being updated
+        condition_columns (Tuple[str, ...]): Names of the columns in the where clause
+
+    Returns:
+        str: UPDATE table SET a = ?, b = ? WHERE c = ? and d = ?
+    """
+    for name in (table,) + update_columns + condition_columns:
+        validate_raw_name(name)
+    update_columns_query = ' = ?, '.join(update_columns)
+    condition_columns_query = ' = ? and '.join(condition_columns)
+    return """UPDATE {}
+                               SET {} = ?
+                               WHERE {} = ?""".format(table, update_columns_query, condition_columns_query)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def select_statement(table: str, columns: Tuple[str, ...] = None):
+    """Builds the SELECT statement used by SQLServerConnection.select and select_iter
+
+    Args:
+        table (str): Name of the table
+        columns (Tuple[str, ...], optional): Names of the columns. Defaults to None, all columns.
+
+    Returns:
+        str: select [a], [b] from [table]
+    """
+    header = '*'
+    if columns is not None:
+        header = ', '.join([quote_identifier(x) for x in columns])
+    return 'select {} from {}'.format(header, quote_identifier(table))
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def exists_key_statement(table: str, key_columns: Tuple[str, ...]):
+    """Builds the statement used by SQLServerConnection.exists_key
+
+    Args:
+        table (str): Name of the table
+        key_columns (Tuple[str, ...]): Names of the key columns
+
+    Returns:
+        str: SELECT TOP 1 1 FROM [table] WHERE [a] = ? AND [b] = ?
+    """
+    condition = ' AND '.join(['{} = ?'.format(quote_identifier(x)) for x in key_columns])
+    return 'SELECT TOP 1 1 FROM {} WHERE {}'.format(quote_identifier(table), condition)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def lookup_statement(table: str, key_columns: Tuple[str, ...], columns: Tuple[str, ...], amount: int):
+    """Builds the statement used by SQLServerConnection.lookup_many for a chunk of keys
+
+    Args:
+        table (str): Name of the table
+        key_columns (Tuple[str, ...]): Names of the key columns
+        columns (Tuple[str, ...]): Names of the columns being selected, None for all columns
+        amount (int): Amount of keys in the chunk
+
+    Returns:
+        str: SELECT ... FROM [table] WHERE [a] IN (?, ?) or WHERE ([a] = ? AND [b] = ?) OR (...)
+    """
+    header = '*'
+    if columns is not None:
+        header = ', '.join([quote_identifier(x) for x in columns])
+    if len(key_columns) == 1:
+        condition = '{} IN ({})'.format(quote_identifier(key_columns[0]), ', '.join(['?']*amount))
+    else:
+        clause = '({})'.format(' AND '.join(['{} = ?'.format(quote_identifier(x)) for x in key_columns]))
+        condition = ' OR '.join([clause]*amount)
+    return 'SELECT {} FROM {} WHERE {}'.format(header, quote_identifier(table), condition)
+
+
+def cache_info():
+    """Returns the hit / miss stats of the statement caches
+
+    Returns:
+        Dict[str, CacheInfo]: the lru_cache stats per kind of statement
+    """
+    return {
+        'insert': insert_statement.cache_info(),
+        'update': update_statement.cache_info(),
+        'select': select_statement.cache_info(),
+        'exists_key': exists_key_statement.cache_info(),
+        'lookup': lookup_statement.cache_info(),
+    }
+
+
+def clear_cache():
+    """Empties all the statement caches"""
+    for statement in (insert_statement, update_statement, select_statement, exists_key_statement, lookup_statement):
+        statement.cache_clear()
@@ -0,0 +1,126 @@
+import datetime
+import decimal
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+
+def _dump_value(value: Any):
+    """Turns a watermark value into json, keeping its type"""
+    if isinstance(value, (bytes, bytearray)):
+        return json.dumps({'type': 'bytes', 'value': bytes(value).hex()})
+    if isinstance(value, datetime.datetime):
+        return json.dumps({'type': 'datetime', 'value': value.isoformat()})
+    if isinstance(value, datetime.date):
+        return json.dumps({'type': 'date', 'value': value.isoformat()})
+    if isinstance(value, decimal.Decimal):
+        return json.dumps({'type': 'decimal', 'value': str(value)})
+    return json.dumps({'type': 'json', 'value': value})
+
+
+def _load_value(text: str):
+    """Reads a watermark value written by _dump_value"""
+    data = json.loads(text)
+    if data['type'] == 'bytes':
+        return bytes.fromhex(data['value'])
+    if data['type'] == 'datetime':
+        return datetime.datetime.strptime(data['value'], '%Y-%m-%dT%H:%M:%S.%f' if '.' in data['value'] else '%Y-%m-%dT%H:%M:%S')
+    if data['type'] == 'date':
+        return datetime.datetime.strptime(data['value'], '%Y-%m-%d').date()
+    if data['type'] == 'decimal':
+        return decimal.Decimal(data['value'])
+    return data['value']
+
+
+class WatermarkStore(object):
+    """Persistent store of the high-water marks of incremental reads, stored in a SQLite file
+
+    Args:
+        object (object): Extends the Class Object
+    """
+
+    def __init__(self, path: str):
+        """Initializes the store, creating the SQLite file and table if they don't exist
+
+        Args:
+            path (str): Path to the SQLite file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS watermarks (
+                                      name TEXT PRIMARY KEY,
+                                      value TEXT NOT NULL,
+                                      updated_at REAL NOT NULL)""")
+
+    def get(self, name: str):
+        """Gets the watermark
+
+        Args:
+            name (str): name of the watermark
+
+        Returns:
+            Any: the watermark, or None if there is none yet
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM watermarks WHERE name = ?", (name,)).fetchone()
+        return _load_value(row[0]) if row is not None else None
+
+    def set(self, name: str, value: Any):
+        """Stores the watermark
+
+        Args:
+            name (str): name of the watermark
+            value (Any): the watermark, e.g. a rowversion (bytes) or a datetime
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                               (name, _dump_value(value), time.time()))
+
+    def reset(self, name: str):
+        """Removes the watermark, so the next read returns all the rows
+
+        Args:
+            name (str): name of the watermark
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM watermarks WHERE name = ?", (name,))
+
+    def close(self):
+        """Closes the SQLite file"""
+        self._conn.close()
+
+
+class ChangeSet(object):
+    """Rows changed since the last committed watermark. The watermark only moves
+    when commit is called, so a failed run reads the same rows again.
+
+    Args:
+        object (object): Extends the Class Object
+
+    Instance Variables
+        rows:       List of the changed rows, as dicts
+        previous:   the watermark the rows were read from
+        watermark:  the highest watermark of the rows, stored on commit
+    """
+
+    def __init__(self, store: WatermarkStore, name: str, rows: List[Dict[str, Any]], previous: Any, watermark: Any):
+        self.store = store
+        self.name = name
+        self.rows = rows
+        self.previous = previous
+        self.watermark = watermark
+
+    def commit(self):
+        """Stores the new watermark, call it once the rows have been processed successfully"""
+        if self.watermark is not None and self.watermark != self.previous:
+            self.store.set(self.name, self.watermark)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def credential_key(*parts):
+    """Creates a key for a set of credentials, without keeping the secrets themselves
+
+    Args:
+        *parts (Str): the credentials, e.g. the api name, client id and client secret
+
+    Returns:
+        Str: sha256 hex digest of the credentials
+    """
+    return hashlib.sha256('\0'.join(str(x) for x in parts).encode('utf-8')).hexdigest()
+
+
+def jwt_expires_in(token):
+    """Reads the exp claim of a JWT token, without verifying it
+
+    Args:
+        token (Str): the JWT token
+
+    Returns:
+        Float: seconds until the token expires, or None if the token has no exp claim
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode('utf-8')).decode('utf-8'))
+        return float(claims['exp']) - time.time()
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenManager(object):
+    """Caches access tokens per credential set and refreshes them before they expire.
+    Tokens are shared by every TokenManager in the process with the same key,
+    and can also be kept in a file so short jobs can reuse them between runs.
+
+    Args:
+        object (object): Extends the Class Object
+    """
+    # in-process cache shared by all instances, key -> (token, expires_at)
+    _tokens = {}
+    _locks = {}
+    # the cache file can be shared by managers of different keys, so it has a lock per path
+    _file_locks = {}
+    _locks_lock = threading.Lock()
+
+    def __init__(self, key, fetch, cache_path=None, margin=60, default_lifetime=3600):
+        """Initializes the manager
+
+        Args:
+            key (Str): key of the credential set, see credential_key
+            fetch (Callable): function that creates a new token, returns (token, expires_in)
+            cache_path (Str, optional): Path to a json file the tokens are also cached in. Defaults to None.
+            margin (Int, optional): Tokens are refreshed when they have less than this many seconds left. Defaults to 60.
+            default_lifetime (Int, optional): Lifetime in seconds assumed when fetch doesn't return one. Defaults to 3600.
+        """
+        self.key = key
+        self.fetch = fetch
+        self.cache_path = cache_path
+        self.margin = margin
+        self.default_lifetime = default_lifetime
+        with TokenManager._locks_lock:
+            self._lock = TokenManager._locks.setdefault(key, threading.Lock())
+            self._file_lock = None
+            if cache_path is not None:
+                self._file_lock = TokenManager._file_locks.setdefault(os.path.abspath(cache_path), threading.Lock())
+
+    def _valid(self, entry):
+        """Checks if the cached entry is still usable"""
+        return entry is not None and entry[1] - self.margin > time.time()
+
+    def get_token(self):
+        """Returns a valid token, from the cache if possible, otherwise a new one
+
+        Returns:
+            Str: the access token
+        """
+        entry = TokenManager._tokens.get(self.key)
+        if self._valid(entry):
+            return entry[0]
+        with self._lock:
+            entry = TokenManager._tokens.get(self.key)
+            if self._valid(entry):
+                return entry[0]
+            entry = self._read_file()
+            if self._valid(entry):
+                TokenManager._tokens[self.key] = entry
+                return entry[0]
+            return self._fetch()
+
+    def refresh(self, stale_token=None):
+        """Creates a new token, unless another thread already replaced the stale one
+
+        Args:
+            stale_token (Str, optional): the token that was rejected. Defaults to None, which always refreshes.
+
+        Returns:
+            Str: the new access token
+        """
+        with self._lock:
+            entry = TokenManager._tokens.get(self.key)
+            if stale_token is not None and self._valid(entry) and entry[0] != stale_token:
+                return entry[0]
+            return self._fetch()
+
+    def invalidate(self):
+        """Removes the cached token, both in-process and in the file"""
+        with self._lock:
+            TokenManager._tokens.pop(self.key, None)
+            self._write_file(None)
+
+    def _fetch(self):
+        """Fetches a new token and caches it, must be called while holding the lock"""
+        token, expires_in = self.fetch()
+        if not token:
+            return token
+        expires_at = time.time() + (expires_in if expires_in else self.default_lifetime)
+        TokenManager._tokens[self.key] = (token, expires_at)
+        self._write_file((token, expires_at))
+        return token
+
+    def _load_file(self):
+        """Loads all the tokens in the cache file"""
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _read_file(self):
+        """Reads the token of this key from the cache file"""
+        if self.cache_path is None:
+            return None
+        with self._file_lock:
+            entry = self._load_file().get(self.key)
+        if entry is None:
+            return None
+        return entry['token'], entry['expires_at']
+
+    def _write_file(self, entry):
+        """Writes the token of this key to the cache file, removes it if entry is None"""
+        if self.cache_path is None:
+            return
+        with self._file_lock:
+            tokens = self._load_file()
+            if entry is None:
+                tokens.pop(self.key, None)
+            else:
+                tokens[self.key] = {'token': entry[0], 'expires_at': entry[1]}
+            # mkstemp creates the file readable by the owner only
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_path)), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(tokens, f)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise